@@ -4,7 +4,7 @@ from pydantic import BaseModel, Field
 from psycopg import connect
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import ToolMessage, SystemMessage, AIMessage, HumanMessage
-from langchain_ollama import OllamaEmbeddings
+from .embedding_provider import get_embeddings
 from langgraph.graph import MessagesState, StateGraph, END
 from langgraph.types import Command
 from langgraph.prebuilt import ToolNode, tools_condition
@@ -19,6 +19,8 @@ from typing import Annotated, Optional, Union
 
 class AgentState(MessagesState):
     cv: Optional[str] 
+    cv_hash: Optional[str]
+    cv_embedding: Optional[list]
     jds: Annotated[list, add]
     sender: Optional[str]
     new_cv: Optional[str]
@@ -81,6 +83,9 @@ class Memory(BaseModel):
         description="Any other preferences mentioned by the user, e.g., remote work, specific industries."
     )
     
+
+class SummarizeOutput(BaseModel):
+    updated_summary: str = Field(..., description="Tóm tắt đã được cập nhật sau khi bao gồm các messages mới")
     
 
 
@@ -121,7 +126,7 @@ class CareerAgent:
         """Use structured LLM output to extract user memory from new messages."""
         print("---EXTRACT USER INFO---")
 
-        extractor = get_llm_structured(Memory)
+        extractor = get_llm_structured(Memory, node="memory_extractor")
         user_id = config["configurable"].get("user_id", "")
         namespace = ("user_info", user_id)
 
@@ -180,9 +185,7 @@ class CareerAgent:
 
         current_summary = state.get("chat_history_summary", "")
         
-        class SummarizeOutput(BaseModel):
-            updated_summary: str = Field(..., description="Tóm tắt đã được cập nhật sau khi bao gồm các messages mới")
-        model = get_llm_structured(SummarizeOutput)
+        model = get_llm_structured(SummarizeOutput, node="message_summarizer")
 
         response = model.invoke([
             SystemMessage(self.memo_instruction.format(
@@ -231,7 +234,7 @@ class CareerAgent:
             pass
         
         
-        model = get_llm(mode=mode)
+        model = get_llm(mode=mode, node="main_agent")
         model = model.bind_tools(self.tools) # cause non streaming
 
 
@@ -260,7 +263,7 @@ class CareerAgent:
     def setup_memory_and_store(self):
         conn = connect(self.pg_uri, autocommit=True)
         self.store = PostgresStore(conn, index={
-            "embed": OllamaEmbeddings(model='nomic-embed-text'),
+            "embed": get_embeddings(),
             "dims": 768,
         })
         self.store.setup()
@@ -0,0 +1,48 @@
+# context_window.py
+# Reports prompts that do not fit the Ollama context window of the client sending them.
+
+import json
+import os
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Room kept for the answer; our clients do not set num_predict.
+num_ctx_output_reserve = int(os.getenv("NUM_CTX_OUTPUT_RESERVE", 1024))
+
+
+def estimate_request_tokens(messages, tools=None) -> int:
+    """Rough prompt size (~3 chars per token) of a chat request: message contents plus tool definitions."""
+    chars = sum(len(str(message.content)) for message in messages)
+    if tools:
+        chars += len(json.dumps(tools, ensure_ascii=False, default=str))
+    return chars // 3 + 1
+
+
+class ContextWindowGuard(BaseCallbackHandler):
+    """
+    Callback attached to every Ollama client from get_llm. Each client keeps one fixed
+    window (`metadata["num_ctx"]`: NUM_CTX, or `num_ctx` in the node's profile), since
+    Ollama reloads the model runner whenever num_ctx changes. Requests that will not
+    fit are logged, because Ollama drops the start of the prompt (or cuts the answer)
+    without saying so.
+    """
+
+    run_inline = True
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None, **kwargs):
+        metadata = metadata or {}
+        window = metadata.get("num_ctx")
+        if not window:
+            return
+        node = metadata.get("llm_node") or metadata.get("langgraph_node") or "unknown"
+        tools = (invocation_params or {}).get("tools")
+        for batch in messages:
+            prompt_tokens = estimate_request_tokens(batch, tools)
+            if prompt_tokens > window:
+                print(f"num_ctx: [{node}] prompt ~{prompt_tokens} tokens exceeds num_ctx {window}, "
+                      f"Ollama will truncate ~{prompt_tokens - window} tokens from the start")
+            elif prompt_tokens + num_ctx_output_reserve > window:
+                print(f"num_ctx: [{node}] prompt ~{prompt_tokens} tokens leaves only "
+                      f"{window - prompt_tokens} of {num_ctx_output_reserve} output tokens in num_ctx {window}")
+
+
+context_guard = ContextWindowGuard()
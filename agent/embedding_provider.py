@@ -0,0 +1,149 @@
+# embedding_provider.py
+
+import dotenv
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+dotenv.load_dotenv()
+
+embed_model = os.getenv("EMBED_MODEL", "nomic-embed-text")
+embed_cache_path = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "embeddings.sqlite"),
+)
+embed_cache_hot_size = int(os.getenv("EMBED_CACHE_HOT_SIZE", 4096))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences map to the same cache entry."""
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with a persistent cache.
+
+    Vectors are keyed on (model, method, sha256 of the normalized text) and stored
+    in a local SQLite file, with an in-memory LRU as the hot tier. Only texts
+    missing from both tiers are sent to the wrapped embeddings model, and they are
+    sent normalized, so a cached vector is always the vector of the hashed text.
+    The method is part of the key because models may embed queries and documents
+    differently.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, path: str = embed_cache_path, hot_size: int = embed_cache_hot_size):
+        self.embeddings = embeddings
+        self.model = model
+        self.hot_size = hot_size
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def _key(self, method: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{method}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]):
+        self._hot[key] = vector
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _lookup(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            cold = []
+            for key in keys:
+                if key in self._hot:
+                    self._hot.move_to_end(key)
+                    found[key] = self._hot[key]
+                else:
+                    cold.append(key)
+            # SQLite caps the number of bound parameters, so query in slices.
+            for start in range(0, len(cold), 500):
+                part = cold[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+        return found
+
+    def _store(self, items: dict):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(key, self.model, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._db.commit()
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = [normalize_text(text) for text in texts]
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        text = normalize_text(text)
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key not in found:
+            found[key] = self.embeddings.embed_query(text)
+            self._store({key: found[key]})
+        return found[key]
+
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model: str = embed_model, base_url: str | None = None) -> Embeddings:
+    """
+    Return the shared, cached embeddings model.
+
+    Args:
+        model: Name of the Ollama embedding model.
+        base_url: Embedding server URL (defaults to OLLAMA_URL / localhost).
+
+    Returns:
+        Embeddings: A CachedEmbeddings instance; one per (model, base_url).
+    """
+    from langchain_ollama import OllamaEmbeddings
+
+    base_url = base_url or os.getenv("OLLAMA_URL", "http://localhost:11434")
+    with _embeddings_lock:
+        if (model, base_url) not in _embeddings:
+            _embeddings[(model, base_url)] = CachedEmbeddings(OllamaEmbeddings(model=model, base_url=base_url), model=model)
+        return _embeddings[(model, base_url)]
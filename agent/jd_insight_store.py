@@ -0,0 +1,74 @@
+# jd_insight_store.py
+# Persistent per-JD structured extractions (JobCriteriaComparison, ExtractorOutput, ...).
+# JD text is static, so an extraction is reused until the JD or the schema version changes.
+
+import threading
+from pydantic import BaseModel
+from psycopg.types.json import Jsonb
+from agent.vector_index import get_connection
+from agent.jd_repository import jd_fingerprint
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_table(conn):
+    global _ready
+    with _ready_lock:
+        if _ready:
+            return
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jd_insights (
+                jd_id          text NOT NULL,
+                jd_hash        text NOT NULL,
+                schema_name    text NOT NULL,
+                schema_version text NOT NULL,
+                insight        jsonb NOT NULL,
+                model          text NOT NULL,
+                created_at     timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (jd_id, jd_hash, schema_name, schema_version)
+            )
+        """)
+        _ready = True
+
+
+def get_insights(jds: dict[str, str], schema: type[BaseModel], version: str, model: str) -> dict:
+    """Return {jd_id: schema instance} for the JDs already extracted by `model` under this version."""
+    if not jds:
+        return {}
+    keys = {str(jd_id): jd_fingerprint(jd) for jd_id, jd in jds.items()}
+    try:
+        with get_connection() as conn:
+            ensure_table(conn)
+            rows = conn.execute("""
+                SELECT jd_id, jd_hash, insight FROM jd_insights
+                WHERE schema_name = %s AND schema_version = %s AND model = %s AND jd_id = ANY(%s)
+            """, (schema.__name__, version, model, list(keys))).fetchall()
+    except Exception as e:
+        print(f"insight store lookup skipped: {e}")
+        return {}
+    return {jd_id: schema(**insight) for jd_id, jd_hash, insight in rows if keys.get(jd_id) == jd_hash}
+
+
+def put_insights(insights: list[tuple[str, str, BaseModel]], version: str, model: str, raise_errors: bool = False):
+    """
+    Store (jd_id, jd_text, insight) triples. For interactive callers a failed write only
+    costs a future re-extraction; `raise_errors=True` lets batch jobs count it as a failure.
+    """
+    if not insights:
+        return
+    try:
+        with get_connection() as conn:
+            ensure_table(conn)
+            with conn.cursor() as cur:
+                cur.executemany("""
+                    INSERT INTO jd_insights (jd_id, jd_hash, schema_name, schema_version, insight, model)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (jd_id, jd_hash, schema_name, schema_version)
+                    DO UPDATE SET insight = EXCLUDED.insight, model = EXCLUDED.model, created_at = now()
+                """, [(str(jd_id), jd_fingerprint(jd), type(insight).__name__, version, Jsonb(insight.model_dump()), model)
+                      for jd_id, jd, insight in insights])
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"insight store write skipped: {e}")
@@ -0,0 +1,118 @@
+# jd_repository.py
+# Shared JD lookup used by the scoring, matching, market-analysis and CV paths.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from agent.tools.retrieve_pg_tools import vector_store
+
+jd_cache_max_bytes = int(os.getenv("JD_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+jd_fetch_window = float(os.getenv("JD_FETCH_WINDOW_MS", 5)) / 1000
+
+
+class _Batch:
+    def __init__(self):
+        self.ids = set()
+        self.results = {}
+        self.error = None
+        self.done = threading.Event()
+
+
+class JDRepository:
+    """
+    Batched, cached access to JD page_content.
+
+    - Concurrent lookups (e.g. the parallel branches of a Send fan-out) that arrive
+      within `window` seconds are coalesced into a single `get_by_ids` round-trip.
+    - Fetched JDs are kept in an LRU cache whose total size is capped at `max_bytes`.
+    """
+
+    def __init__(self, store, max_bytes: int = jd_cache_max_bytes, window: float = jd_fetch_window):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.window = window
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._inflight = {}
+        self._collecting = None
+        self._lock = threading.Lock()
+
+    def _remember(self, jd_id: str, content: str):
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if jd_id in self._cache:
+            self._cache_bytes -= len(self._cache.pop(jd_id).encode("utf-8"))
+        self._cache[jd_id] = content
+        self._cache_bytes += size
+        while self._cache_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted.encode("utf-8"))
+
+    def _fetch(self, batch: _Batch):
+        try:
+            print(f"--jd fetch: {len(batch.ids)} ids in one query--")
+            docs = self.store.get_by_ids(list(batch.ids))
+            batch.results = {str(doc.id): doc.page_content for doc in docs}
+        except Exception as error:
+            batch.error = error
+        with self._lock:
+            for jd_id, content in batch.results.items():
+                self._remember(jd_id, content)
+            for jd_id in batch.ids:
+                self._inflight.pop(jd_id, None)
+        batch.done.set()
+
+    def get_many(self, ids) -> dict[str, str]:
+        """Return {id: page_content} for the ids that exist; unknown ids are left out."""
+        ids = [str(i) for i in ids]
+        found, waits, leader_batch = {}, set(), None
+
+        with self._lock:
+            for jd_id in ids:
+                if jd_id in self._cache:
+                    self._cache.move_to_end(jd_id)
+                    found[jd_id] = self._cache[jd_id]
+                elif jd_id in self._inflight:
+                    waits.add(self._inflight[jd_id])
+                else:
+                    if self._collecting is None:
+                        self._collecting = leader_batch = _Batch()
+                    self._collecting.ids.add(jd_id)
+                    self._inflight[jd_id] = self._collecting
+                    waits.add(self._collecting)
+
+        if leader_batch:
+            # Give concurrent callers a moment to join this batch, then close it.
+            time.sleep(self.window)
+            with self._lock:
+                self._collecting = None
+            self._fetch(leader_batch)
+
+        for batch in waits:
+            batch.done.wait()
+            if batch.error:
+                raise batch.error
+            found.update({jd_id: batch.results[jd_id] for jd_id in ids if jd_id in batch.results})
+        return found
+
+    def get(self, jd_id) -> str | None:
+        return self.get_many([jd_id]).get(str(jd_id))
+
+
+jd_repository = JDRepository(vector_store)
+
+
+def get_jds(ids) -> dict[str, str]:
+    return jd_repository.get_many(ids)
+
+
+def get_jd(jd_id) -> str | None:
+    return jd_repository.get(jd_id)
+
+
+def jd_fingerprint(jd: str) -> str:
+    """Content hash of a JD body; cached scores and insights are tied to it."""
+    return hashlib.sha256(jd.encode("utf-8")).hexdigest()
@@ -0,0 +1,176 @@
+# llm_cache.py
+# Opt-in response cache for chat model calls, enabled per node in llm_provider.
+
+import dotenv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+dotenv.load_dotenv()
+
+llm_cache_path = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_cache.sqlite"),
+)
+llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+# Nodes whose calls are cached, e.g. "coordinator,review_cv,market_summary"; "*" caches every node.
+llm_cache_nodes = {node.strip() for node in os.getenv("LLM_CACHE_NODES", "").split(",") if node.strip()}
+# Near-duplicate tier: same context, last message within this cosine similarity.
+llm_cache_semantic = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+llm_cache_similarity = float(os.getenv("LLM_CACHE_SIMILARITY", 0.95))
+llm_cache_semantic_scan = int(os.getenv("LLM_CACHE_SEMANTIC_SCAN", 500))
+
+
+def cache_enabled(node: str | None) -> bool:
+    return "*" in llm_cache_nodes or (node is not None and node in llm_cache_nodes)
+
+
+def _sha(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def _split_prompt(prompt: str) -> tuple[str, str]:
+    """Split the serialized message list into (everything but the last message, last message text)."""
+    try:
+        messages = json.loads(prompt)
+        last = messages[-1].get("kwargs", {}).get("content", "")
+        return json.dumps(messages[:-1], sort_keys=True), last if isinstance(last, str) else json.dumps(last)
+    except (ValueError, AttributeError, IndexError, TypeError):
+        return prompt, ""
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain cache backed by a local SQLite file.
+
+    Exact tier: key = sha256(llm_string, normalized prompt). `llm_string` already
+    carries the model, the sampling parameters and the structured-output schema.
+    Semantic tier (optional): on an exact miss, reuse an entry with the same
+    llm_string and preceding messages whose last message embeds within
+    `similarity` of the new one.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least recently
+    hit entries are evicted.
+    """
+
+    def __init__(self, path: str = llm_cache_path, ttl: float = llm_cache_ttl, max_entries: int = llm_cache_max_entries,
+                 semantic: bool = llm_cache_semantic, similarity: float = llm_cache_similarity):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.semantic_hits = self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                query_vector BLOB,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_hit REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_context ON llm_cache (context_key, created_at)")
+        self._db.commit()
+
+    def _embed(self, text: str):
+        from agent.embedding_provider import get_embeddings
+        vector = np.asarray(get_embeddings().embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = _sha(llm_string, " ".join(prompt.split()))
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row:
+                self._db.execute("UPDATE llm_cache SET last_hit = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self.hits += 1
+                return loads(row[0], allowed_objects="core")
+
+        if self.semantic:
+            context, query = _split_prompt(prompt)
+            if query:
+                hit = self._semantic_lookup(_sha(llm_string, context), query, now)
+                if hit is not None:
+                    return hit
+        self.misses += 1
+        return None
+
+    def _semantic_lookup(self, context_key: str, query: str, now: float):
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT key, query_vector, response FROM llm_cache
+                WHERE context_key = ? AND query_vector IS NOT NULL AND created_at > ?
+                ORDER BY created_at DESC LIMIT ?
+            """, (context_key, now - self.ttl, llm_cache_semantic_scan)).fetchall()
+        if not rows:
+            return None
+        vector = self._embed(query)
+        scores = [float(np.dot(vector, np.frombuffer(blob, dtype=np.float32))) for _, blob, _ in rows]
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE llm_cache SET last_hit = ? WHERE key = ?", (now, rows[best][0]))
+            self._db.commit()
+            self.semantic_hits += 1
+        print(f"llm cache: near-duplicate hit (similarity {scores[best]:.3f})")
+        return loads(rows[best][2], allowed_objects="core")
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = _sha(llm_string, " ".join(prompt.split()))
+        context, query = _split_prompt(prompt)
+        vector = self._embed(query).tobytes() if self.semantic and query else None
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, context_key, query_vector, response, created_at, last_hit) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, _sha(llm_string, context), vector, dumps(list(return_val)), now, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+        self._db.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "semantic_hits": self.semantic_hits, "misses": self.misses}
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteLLMCache:
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteLLMCache()
+        return _llm_cache
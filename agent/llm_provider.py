@@ -1,35 +1,157 @@
 # llm_provider.py
 
 import dotenv
+import httpx
+import json
+import threading
 from pydantic import BaseModel
 from typing import Literal
 from langchain_core.language_models.chat_models import BaseChatModel # Import để type hint
+from agent.llm_cache import cache_enabled, get_llm_cache
+from agent.llm_usage import usage_tracker
+from agent.context_window import context_guard
 dotenv.load_dotenv()
 import os
 
 default_model = os.getenv("DEFAULT_MODEL", "qwen3:4b")
 num_ctx = int(os.getenv("NUM_CTX", 4096))
 
+# ---------------------------- Model profiles ----------------------------
+# Routing and classification nodes need far less capacity than the writers, so
+# each node resolves to a tier. Every tier defaults to DEFAULT_MODEL.
+model_tiers = {
+    "small": os.getenv("SMALL_MODEL", default_model),
+    "default": default_model,
+    "large": os.getenv("LARGE_MODEL", default_model),
+}
+default_profiles = {
+    # routing / classification / short summaries
+    "coordinator": "small",
+    "cv_expert": "small",
+    "job_searcher": "small",
+    "jd_agent": "small",
+    "memory_extractor": "small",
+    "message_summarizer": "small",
+    "summarize": "small",
+    "score_summary": "small",
+    "market_summary": "small",
+    # long-form writing where model size shows in the output
+    "cv_writer": "large",
+    "adjust_cv": "large",
+    "review_cv": "large",
+    "content_reviewer": "large",
+    "format_reviewer": "large",
+    "cv_suggestor": "large",
+}
+
+def load_profiles() -> dict:
+    """
+    Per-node overrides from LLM_PROFILES (JSON) or the JSON file at LLM_PROFILES_PATH,
+    layered over `default_profiles`. A value is a tier, a model name, or a dict with
+    any of tier / model / mode / num_ctx:
+        {"coordinator": "qwen3:0.6b", "score": "default", "cv_writer": {"model": "qwen3:14b", "mode": "think"}}
+    """
+    profiles = dict(default_profiles)
+    path = os.getenv("LLM_PROFILES_PATH")
+    if path:
+        with open(path) as f:
+            profiles.update(json.load(f))
+    if os.getenv("LLM_PROFILES"):
+        profiles.update(json.loads(os.getenv("LLM_PROFILES")))
+    return profiles
+
+llm_profiles = load_profiles()
+
+def node_profile(node: str | None) -> dict:
+    """Resolved {model, mode, num_ctx} for a node; unknown nodes use the "*" entry or DEFAULT_MODEL."""
+    profile = llm_profiles.get(node, llm_profiles.get("*", "default"))
+    if isinstance(profile, str):
+        profile = {"tier": profile} if profile in model_tiers else {"model": profile}
+    profile = dict(profile)
+    profile.setdefault("model", model_tiers.get(profile.pop("tier", "default"), default_model))
+    profile.setdefault("mode", "non-think")
+    profile.setdefault("num_ctx", num_ctx)
+    return profile
+
+# One keep-alive connection pool shared by every client built here.
+llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", 32))
+llm_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 120))
+ollama_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE")  # how long Ollama keeps the model loaded, e.g. "30m"
+
+_pool_limits = httpx.Limits(
+    max_connections=llm_max_connections,
+    max_keepalive_connections=llm_max_connections,
+    keepalive_expiry=llm_keepalive_expiry,
+)
+_sync_transport = httpx.HTTPTransport(limits=_pool_limits)
+_async_transport = httpx.AsyncHTTPTransport(limits=_pool_limits)
+
+# Memoized clients: built once per node and configuration, then shared across threads.
+_registry = {}
+_registry_lock = threading.RLock()
+
+def _memoized(key, build):
+    llm = _registry.get(key)
+    if llm is None:
+        with _registry_lock:
+            llm = _registry.get(key)
+            if llm is None:
+                llm = _registry[key] = build()
+    return llm
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~3 chars per token) used to budget prompts against num_ctx."""
+    return len(text) // 3 + 1
+
 def get_llm(
-    model: Literal["qwen3:4b","qwen3:8b", "qwen3:14b", "qwen3:30b", "gpt-4o"] = default_model,
-    mode: Literal["think", "non-think"] = "non-think",
-    num_ctx = num_ctx,
+    model: Literal["qwen3:4b","qwen3:8b", "qwen3:14b", "qwen3:30b", "gpt-4o"] | None = None,
+    mode: Literal["think", "non-think"] | None = None,
+    num_ctx: int | None = None,
+    timeout: float | None = None,
+    node: str | None = None,
 ) -> BaseChatModel:
     """
     Return a configured ChatOllama model.
 
     Args:
-        model: Name of the model to use.
+        model: Name of the model to use. Defaults to the node's profile (see `node_profile`).
         mode: If 'think', use settings for deeper reasoning. Otherwise, use default non-think settings.
+        num_ctx: Context window; defaults to the node's profile, then NUM_CTX. Keep one value
+            per model: Ollama reloads the model whenever the window changes.
+        timeout: Per-request timeout in seconds; the HTTP call is aborted when it is exceeded.
+        node: Name of the calling graph node. Selects the model profile, groups the usage
+            report, and turns on response caching when listed in LLM_CACHE_NODES.
 
     Returns:
         BaseChatModel: An instance of ChatOllama with the desired configuration.
+        Instances are cached per (node, model, mode, num_ctx, timeout, cache) and safe to share
+        between threads; all of them use the same HTTP connection pool.
     """
+    profile = node_profile(node)
+    model = model or profile["model"]
+    mode = mode or profile["mode"]
+    num_ctx = num_ctx or profile["num_ctx"]
+    cache = cache_enabled(node)
+    return _memoized((node, model, mode, num_ctx, timeout, cache), lambda: _build_llm(model, mode, num_ctx, timeout, cache, node))
+
+
+def _build_llm(model, mode, num_ctx, timeout, cache, node=None) -> BaseChatModel:
+    cache = get_llm_cache() if cache else False
+    # read back by the usage tracker to report per node
+    metadata = {"llm_node": node} if node else None
     try:
         if model == 'gpt-4o':
             from langchain_openai import ChatOpenAI
             
-            llm = ChatOpenAI(model="gpt-4o")
+            llm = ChatOpenAI(
+                model="gpt-4o",
+                timeout=timeout,
+                http_client=httpx.Client(transport=_sync_transport),
+                http_async_client=httpx.AsyncClient(transport=_async_transport),
+                cache=cache,
+                callbacks=[usage_tracker],
+                metadata=metadata,
+            )
         else: 
             from langchain_ollama import ChatOllama
 
@@ -48,6 +170,14 @@ def get_llm(
                 top_k=20,
                 repeat_penalty=1.1,
                 num_ctx = num_ctx,
+                keep_alive = ollama_keep_alive,
+                client_kwargs = {"timeout": timeout} if timeout else {},
+                sync_client_kwargs = {"transport": _sync_transport},
+                async_client_kwargs = {"transport": _async_transport},
+                cache = cache,
+                callbacks = [usage_tracker, context_guard],
+                # num_ctx is read back by context_guard to log prompts that will be truncated
+                metadata = {**(metadata or {}), "num_ctx": num_ctx},
             )
 
         return llm
@@ -60,8 +190,8 @@ def get_llm(
 
 def get_llm_structured(
     schema: type[BaseModel],
-    model: Literal["qwen3:4b","qwen3:8b", "qwen3:14b", "qwen3:30b", "qwq", "gpt-4o"] = default_model, 
-    mode: Literal["think", "non-think"] = "non-think",
+    model: Literal["qwen3:4b","qwen3:8b", "qwen3:14b", "qwen3:30b", "qwq", "gpt-4o"] | None = None, 
+    mode: Literal["think", "non-think"] | None = None,
     **kwargs
 ) -> BaseChatModel:
     """
@@ -69,11 +199,11 @@ def get_llm_structured(
 
     Args:
         schema: Pydantic schema to enforce structure on output.
-        model: Model name.
+        model: Model name; defaults to the profile of `node` (passed through kwargs).
         mode: Think vs non-think mode.
 
     Returns:
-        BaseChatModel: Structured-output LLM.
+        BaseChatModel: Structured-output LLM, cached per (model, mode, schema, options).
     """
-    llm = get_llm(model=model, mode=mode, **kwargs)
-    return llm.with_structured_output(schema=schema)
\ No newline at end of file
+    key = ("structured", model, mode, schema, tuple(sorted(kwargs.items())))
+    return _memoized(key, lambda: get_llm(model=model, mode=mode, **kwargs).with_structured_output(schema=schema))
\ No newline at end of file
@@ -0,0 +1,110 @@
+# llm_usage.py
+# Per-node latency and token accounting for every chat model built in llm_provider.
+
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class NodeUsageTracker(BaseCallbackHandler):
+    """
+    Callback attached to every client from get_llm. Clients carry their node in
+    `metadata["llm_node"]`, so calls are grouped by the `node=` given to get_llm
+    (falling back to the graph node). Token counts come from the response
+    `usage_metadata` (Ollama's prompt_eval_count / eval_count).
+
+    Totals are kept for the whole process. Calls made under a run config with
+    `metadata["usage_turn"]` are also counted for that turn (see `usage_report`).
+    """
+
+    run_inline = True  # cheap and lock-protected: no executor hop on the async path
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self.nodes = {}
+        self.turns = {}
+
+    def _start(self, run_id, metadata):
+        metadata = metadata or {}
+        node = metadata.get("llm_node") or metadata.get("langgraph_node") or "unknown"
+        model = metadata.get("ls_model_name", "")
+        with self._lock:
+            self._started[run_id] = (node, model, metadata.get("usage_turn"), time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def _finish(self, run_id, input_tokens=0, output_tokens=0, error=False):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started is None:
+                return
+            node, model, turn, t0 = started
+            elapsed = time.perf_counter() - t0
+            tables = [self.nodes] + ([self.turns.setdefault(turn, {})] if turn else [])
+            for table in tables:
+                stats = table.setdefault(node, {
+                    "model": model, "calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                    "input_tokens": 0, "output_tokens": 0,
+                })
+                stats["model"] = model or stats["model"]
+                stats["calls"] += 1
+                stats["errors"] += error
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                stats["input_tokens"] += input_tokens
+                stats["output_tokens"] += output_tokens
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        self._finish(run_id, input_tokens, output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {node: dict(stats) for node, stats in self.nodes.items()}
+
+    def pop_turn(self, turn: str) -> dict:
+        with self._lock:
+            return self.turns.pop(turn, {})
+
+    def reset(self):
+        with self._lock:
+            self.nodes.clear()
+            self.turns.clear()
+
+
+usage_tracker = NodeUsageTracker()
+
+
+def usage_report(turn: str | None = None) -> str:
+    """
+    Markdown table of calls, latency and tokens per node: cumulative since start (or the
+    last reset), or only the calls of `turn` (a run's `metadata["usage_turn"]`, cleared once reported).
+    """
+    nodes = usage_tracker.snapshot() if turn is None else usage_tracker.pop_turn(turn)
+    if not nodes:
+        return "No LLM calls recorded."
+    lines = [
+        "| Node | Model | Calls | Errors | Avg s | Max s | Input tok | Output tok | Output tok/s |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for node, s in sorted(nodes.items(), key=lambda item: -item[1]["seconds"]):
+        avg = s["seconds"] / max(s["calls"], 1)
+        rate = s["output_tokens"] / s["seconds"] if s["seconds"] else 0
+        lines.append(
+            f"| {node} | {s['model']} | {s['calls']} | {s['errors']} | {avg:.2f} | {s['max_seconds']:.2f} "
+            f"| {s['input_tokens']} | {s['output_tokens']} | {rate:.1f} |"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+# market_analytics.py
+# Numeric market statistics over the per-JD insights in jd_insights.
+# Everything is aggregated in SQL; the LLM only writes the narrative on top of it.
+
+from agent.vector_index import get_connection, collection_name
+
+# Insights are only counted while they still match the JD text (same hash the
+# insight store computes in Python: sha256 of the utf-8 document).
+CURRENT_INSIGHTS = """
+    current_insights AS (
+        SELECT i.jd_id, i.schema_name, i.insight
+        FROM jd_insights i
+        JOIN langchain_pg_embedding e ON e.id = i.jd_id
+        JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+        WHERE c.name = %(collection)s
+          AND i.jd_id = ANY(%(ids)s)
+          AND i.jd_hash = encode(sha256(convert_to(e.document, 'UTF8')), 'hex')
+          AND ((i.schema_name = 'JobCriteriaComparison' AND i.schema_version = %(criteria_version)s)
+            OR (i.schema_name = 'ExtractorOutput' AND i.schema_version = %(extractor_version)s))
+    )
+"""
+
+# One row per (JD, skill): list-valued ExtractorOutput skills plus the free-text
+# JobCriteriaComparison field split on separators.
+JD_SKILLS = """
+    jd_skills AS (
+        SELECT DISTINCT jd_id, skill FROM (
+            SELECT jd_id, lower(trim(s)) AS skill
+            FROM current_insights, jsonb_array_elements_text(insight->'technical_skills') s
+            WHERE schema_name = 'ExtractorOutput'
+            UNION ALL
+            SELECT jd_id, lower(trim(s)) AS skill
+            FROM current_insights,
+                 regexp_split_to_table(insight->>'technical_skills_tools', '\\s*[,;/]\\s*|\\s+and\\s+') s
+            WHERE schema_name = 'JobCriteriaComparison'
+        ) raw
+        WHERE skill <> '' AND length(skill) <= 60
+    )
+"""
+
+SKILLS_SQL = f"""
+    WITH {CURRENT_INSIGHTS}, {JD_SKILLS}
+    SELECT skill, count(*) AS jds
+    FROM jd_skills
+    GROUP BY skill
+    ORDER BY jds DESC, skill
+    LIMIT %(top_n)s
+"""
+
+SKILL_PAIRS_SQL = f"""
+    WITH {CURRENT_INSIGHTS}, {JD_SKILLS},
+    top_skills AS (
+        SELECT skill FROM jd_skills GROUP BY skill ORDER BY count(*) DESC, skill LIMIT %(top_n)s
+    )
+    SELECT a.skill, b.skill, count(*) AS jds
+    FROM jd_skills a
+    JOIN jd_skills b ON a.jd_id = b.jd_id AND a.skill < b.skill
+    WHERE a.skill IN (SELECT skill FROM top_skills) AND b.skill IN (SELECT skill FROM top_skills)
+    GROUP BY a.skill, b.skill
+    ORDER BY jds DESC, a.skill, b.skill
+    LIMIT %(top_n)s
+"""
+
+EXPERIENCE_SQL = f"""
+    WITH {CURRENT_INSIGHTS},
+    years AS (
+        SELECT substring(insight->>'years_of_experience' from '(\\d+)')::int AS y
+        FROM current_insights
+        WHERE schema_name = 'JobCriteriaComparison'
+    )
+    SELECT CASE
+               WHEN y IS NULL THEN 'unspecified'
+               WHEN y <= 1 THEN '0-1 years'
+               WHEN y <= 3 THEN '2-3 years'
+               WHEN y <= 5 THEN '4-5 years'
+               WHEN y <= 9 THEN '6-9 years'
+               ELSE '10+ years'
+           END AS band,
+           count(*) AS jds
+    FROM years
+    GROUP BY band
+    ORDER BY min(coalesce(y, 1000))
+"""
+
+LOCATION_SQL = f"""
+    WITH {CURRENT_INSIGHTS}
+    SELECT CASE
+               WHEN insight->>'location_mode' ILIKE '%%hybrid%%' THEN 'hybrid'
+               WHEN insight->>'location_mode' ILIKE '%%remote%%' THEN 'remote'
+               WHEN insight->>'location_mode' ~* 'on-?site|office|in[- ]person' THEN 'on-site'
+               ELSE 'unspecified'
+           END AS mode,
+           count(*) AS jds
+    FROM current_insights
+    WHERE schema_name = 'JobCriteriaComparison'
+    GROUP BY mode
+    ORDER BY jds DESC
+"""
+
+LOCATIONS_SQL = f"""
+    WITH {CURRENT_INSIGHTS}
+    SELECT lower(trim(insight->>'location_mode')) AS location, count(*) AS jds
+    FROM current_insights
+    WHERE schema_name = 'JobCriteriaComparison' AND coalesce(insight->>'location_mode', '') <> ''
+    GROUP BY location
+    ORDER BY jds DESC, location
+    LIMIT %(top_n)s
+"""
+
+# Shares are taken over the JDs that have the insight type a table is built from:
+# skills come from either schema, experience and location only from JobCriteriaComparison.
+COVERAGE_SQL = f"""
+    WITH {CURRENT_INSIGHTS}
+    SELECT count(DISTINCT jd_id),
+           count(DISTINCT jd_id) FILTER (WHERE schema_name = 'JobCriteriaComparison'),
+           count(DISTINCT jd_id) FILTER (WHERE schema_name = 'ExtractorOutput')
+    FROM current_insights
+"""
+
+
+def market_stats(jd_ids: list[str], criteria_version: str, extractor_version: str, top_n: int = 15, collection: str = collection_name) -> dict:
+    """
+    Aggregate the stored insights of `jd_ids` into counts and frequency tables.
+
+    Returns skill frequencies, co-occurring skill pairs (among the top skills),
+    experience bands, work modes and the most common locations. `jds_with_insights`
+    tells how many of the requested JDs the numbers are based on, `jds_with_criteria`
+    and `jds_with_extractor` how many have each insight type.
+    """
+    params = {
+        "collection": collection,
+        "ids": [str(i) for i in jd_ids],
+        "criteria_version": criteria_version,
+        "extractor_version": extractor_version,
+        "top_n": top_n,
+    }
+    with get_connection() as conn:
+        run = lambda sql: conn.execute(sql, params).fetchall()
+        with_insights, with_criteria, with_extractor = run(COVERAGE_SQL)[0]
+        return {
+            "jds_requested": len(jd_ids),
+            "jds_with_insights": with_insights,
+            "jds_with_criteria": with_criteria,
+            "jds_with_extractor": with_extractor,
+            "skills": [{"skill": s, "jds": n} for s, n in run(SKILLS_SQL)],
+            "skill_pairs": [{"skills": [a, b], "jds": n} for a, b, n in run(SKILL_PAIRS_SQL)],
+            "experience_bands": [{"band": b, "jds": n} for b, n in run(EXPERIENCE_SQL)],
+            "work_modes": [{"mode": m, "jds": n} for m, n in run(LOCATION_SQL)],
+            "locations": [{"location": l, "jds": n} for l, n in run(LOCATIONS_SQL)],
+        }
+
+
+def format_market_stats(stats: dict) -> str:
+    """Markdown tables of the aggregates, used as the only input of the narrative prompt."""
+    lines = [f"Based on {stats['jds_with_insights']} of {stats['jds_requested']} job descriptions "
+             f"({stats['jds_with_criteria']} with experience and work mode details).", ""]
+
+    def table(title, header, rows, total):
+        if not rows:
+            return
+        total = max(total, 1)
+        lines.extend([f"### {title}", f"| {header} | JDs | Share |", "|---|---|---|"])
+        lines.extend(f"| {label} | {n} | {100 * n / total:.0f}% |" for label, n in rows)
+        lines.append("")
+
+    table("Most requested skills", "Skill", [(r["skill"], r["jds"]) for r in stats["skills"]], stats["jds_with_insights"])
+    table("Skills that appear together", "Skill pair", [(" + ".join(r["skills"]), r["jds"]) for r in stats["skill_pairs"]], stats["jds_with_insights"])
+    table("Experience required", "Band", [(r["band"], r["jds"]) for r in stats["experience_bands"]], stats["jds_with_criteria"])
+    table("Work mode", "Mode", [(r["mode"], r["jds"]) for r in stats["work_modes"]], stats["jds_with_criteria"])
+    table("Locations", "Location", [(r["location"], r["jds"]) for r in stats["locations"]], stats["jds_with_criteria"])
+    return "\n".join(lines)
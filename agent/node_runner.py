@@ -0,0 +1,77 @@
+# node_runner.py
+# Graph nodes and tools written once, runnable from both graph.invoke/stream and graph.ainvoke/astream.
+
+import asyncio
+import functools
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.tools import StructuredTool
+
+
+def _args(value) -> tuple:
+    # plain functions take a tuple as their positional arguments
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _call(target, value):
+    return target.invoke(value) if isinstance(target, Runnable) else target(*_args(value))
+
+
+async def _acall(target, value):
+    if isinstance(target, Runnable):
+        return await target.ainvoke(value)
+    return await asyncio.to_thread(target, *_args(value))
+
+
+def sync_and_async(step):
+    """
+    Build a sync and an async function from one generator function.
+
+    `step` yields `(target, value)` for every slow call - a runnable (model, subgraph,
+    tool) or a plain blocking function such as a Postgres read/write, whose arguments
+    are `value` (a tuple for several) - and is sent back the result (or has the
+    exception thrown in). Its return value is the result of the call.
+    The sync function runs the targets with `.invoke`; the async one awaits `.ainvoke`
+    and pushes plain functions to a worker thread, so a node waiting on the LLM
+    never holds the event loop.
+    """
+    @functools.wraps(step)
+    def run(*args, **kwargs):
+        steps = step(*args, **kwargs)
+        result, error = None, None
+        try:
+            while True:
+                target, value = steps.throw(error) if error else steps.send(result)
+                try:
+                    result, error = _call(target, value), None
+                except Exception as e:
+                    result, error = None, e
+        except StopIteration as done:
+            return done.value
+
+    @functools.wraps(step)
+    async def arun(*args, **kwargs):
+        steps = step(*args, **kwargs)
+        result, error = None, None
+        try:
+            while True:
+                target, value = steps.throw(error) if error else steps.send(result)
+                try:
+                    result, error = await _acall(target, value), None
+                except Exception as e:
+                    result, error = None, e
+        except StopIteration as done:
+            return done.value
+
+    return run, arun
+
+
+def llm_node(step) -> RunnableLambda:
+    """Decorator: a graph node with an `invoke` and an `ainvoke` path (see `sync_and_async`)."""
+    run, arun = sync_and_async(step)
+    return RunnableLambda(run, afunc=arun, name=step.__name__)
+
+
+def llm_tool(step) -> StructuredTool:
+    """Decorator: like `@tool`, but the tool also gets a coroutine (see `sync_and_async`)."""
+    run, arun = sync_and_async(step)
+    return StructuredTool.from_function(run, arun)
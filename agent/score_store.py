@@ -0,0 +1,72 @@
+# score_store.py
+# Persistent CV x JD score cache, shared by score_jobs and the jd_agent scoring graph.
+
+import threading
+from psycopg.types.json import Jsonb
+from agent.vector_index import get_connection
+from agent.jd_repository import jd_fingerprint
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_table(conn):
+    global _ready
+    with _ready_lock:
+        if _ready:
+            return
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cv_jd_scores (
+                cv_hash        text NOT NULL,
+                jd_id          text NOT NULL,
+                jd_hash        text NOT NULL,
+                model          text NOT NULL,
+                prompt_version text NOT NULL,
+                feedback       jsonb NOT NULL,
+                created_at     timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (cv_hash, jd_id, jd_hash, model, prompt_version)
+            )
+        """)
+        _ready = True
+
+
+def get_scores(cv_hash: str, jds: dict[str, str], prompt_version: str, model: str) -> dict[str, dict]:
+    """
+    Return {jd_id: feedback} for the JDs already scored against this CV.
+
+    A hit requires the same JD text, model and prompt version, so editing a JD
+    or a prompt invalidates its scores. Lookup errors are treated as misses.
+    """
+    if not jds:
+        return {}
+    keys = {jd_id: jd_fingerprint(jd) for jd_id, jd in jds.items()}
+    try:
+        with get_connection() as conn:
+            ensure_table(conn)
+            rows = conn.execute("""
+                SELECT jd_id, jd_hash, feedback FROM cv_jd_scores
+                WHERE cv_hash = %s AND model = %s AND prompt_version = %s AND jd_id = ANY(%s)
+            """, (cv_hash, model, prompt_version, list(keys))).fetchall()
+    except Exception as e:
+        print(f"score cache lookup skipped: {e}")
+        return {}
+    return {jd_id: feedback for jd_id, jd_hash, feedback in rows if keys.get(jd_id) == jd_hash}
+
+
+def put_scores(cv_hash: str, scores: list[tuple[str, str, dict]], prompt_version: str, model: str):
+    """Store (jd_id, jd_text, feedback) triples; failures only cost a future cache miss."""
+    if not scores:
+        return
+    try:
+        with get_connection() as conn:
+            ensure_table(conn)
+            with conn.cursor() as cur:
+                cur.executemany("""
+                    INSERT INTO cv_jd_scores (cv_hash, jd_id, jd_hash, model, prompt_version, feedback)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (cv_hash, jd_id, jd_hash, model, prompt_version)
+                    DO UPDATE SET feedback = EXCLUDED.feedback, created_at = now()
+                """, [(cv_hash, str(jd_id), jd_fingerprint(jd), model, prompt_version, Jsonb(feedback))
+                      for jd_id, jd, feedback in scores])
+    except Exception as e:
+        print(f"score cache write skipped: {e}")
@@ -19,7 +19,8 @@ from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
 from agent.llm_provider import get_llm_structured, get_llm
-from agent.tools.retrieve_pg_tools import vector_store
+from agent.tools.retrieve_pg_tools import vector_store, embed_cv, cv_fingerprint
+from agent.node_runner import llm_node
 from langgraph.constants import Send
 from typing import Optional, Literal, List, Union, Dict, get_args
 import os 
@@ -88,6 +89,7 @@ class CoordinatorOutput(BaseModel):
     )
     message_to_user: str = Field(..., description="A friendly message/ notification to send to the user.")
        
+@llm_node
 def coordinator_node(state: AgentState) -> Command:
     print('---coord --- state:------', state.keys())
     print('--------- sender', state.get('message_from_sender', ''))
@@ -99,19 +101,26 @@ def coordinator_node(state: AgentState) -> Command:
                     update= {"messages": [state['message_from_sender']],'message_from_sender': ''}
             )
     # Command(update={"messages": [ToolMessage(state['messages'][-1].content, tool_call_id=tool_call_id)]})
-    llm = get_llm_structured(CoordinatorOutput)
+    llm = get_llm_structured(CoordinatorOutput, node="coordinator")
     messages = state['messages']
     cv = state.get('cv', '')
+    cv_update = {}
     if cv:
         print('have cv')
         add_in = f"\n **Note: Here is the full Curriculum Vitae (CV) of user (To let you know he already upload it): {cv[:200]}"
+        if state.get('cv_hash') != cv_fingerprint(cv):
+            # New/changed CV: embed it once and keep the vector with the thread
+            try:
+                cv_hash, cv_embedding = yield embed_cv, cv
+                cv_update = {'cv_hash': cv_hash, 'cv_embedding': cv_embedding}
+            except Exception as e:
+                # not needed to answer this turn: the search tools embed the CV lazily (get_cv_embedding)
+                print(f"cv embedding skipped: {e}")
     else:
         add_in = '\n **Note: User havent upload cv yet'
     
     
-    response = llm.invoke(
-        [SystemMessage(COORDINATOR_SYSTEM_PROMPT+add_in)] + messages[-4:]
-    )
+    response = yield llm, [SystemMessage(COORDINATOR_SYSTEM_PROMPT+add_in)] + messages[-4:]
     print('res:------', response)
     
     if response.next_step == "__end__":
@@ -120,14 +129,16 @@ def coordinator_node(state: AgentState) -> Command:
         #     update=,'sender': 'coordinator'},
         # )
         return Command( goto = "__end__",
-                    update= {"messages": [AIMessage(response.message_to_user)]}
+                    update= {"messages": [AIMessage(response.message_to_user)], **cv_update}
             )
     else:
         # return 
         return Command(goto = [Send(response.next_step, {"messages":  response.message_to_next_agent+ "(user said: "+ messages[-1].content+ ' /no_think', 
                                 'sender': 'coordinator',
                                 'cv': state.get('cv', ''),
+                                'cv_hash': cv_update.get('cv_hash', state.get('cv_hash')),
+                                'cv_embedding': cv_update.get('cv_embedding', state.get('cv_embedding')),
                                 'content_reviewer_insights': state.get('content_reviewer_insights', ''),
                                 'format_reviewer_insights': state.get('format_reviewer_insights', ''),
-                                }),], update = {"messages": [AIMessage(response.message_to_user)]}
+                                }),], update = {"messages": [AIMessage(response.message_to_user)], **cv_update}
             )
\ No newline at end of file
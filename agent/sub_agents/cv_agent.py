@@ -18,8 +18,12 @@ from langgraph.prebuilt import InjectedState
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
-from agent.llm_provider import get_llm_structured, get_llm
+from agent.llm_provider import get_llm_structured, get_llm, node_profile
 from agent.tools.retrieve_pg_tools import vector_store
+from agent.jd_repository import get_jd
+from agent.jd_insight_store import get_insights, put_insights
+from agent.tools.match_cv_jd_tools import ExtractorOutput
+from agent.node_runner import llm_node, sync_and_async
 from langgraph.constants import Send
 from typing import Optional, Literal, List, Union, Dict, get_args
 import os 
@@ -63,8 +67,8 @@ class CVExpertOutput(BaseModel):
 
     # Chỉ mục (index) của job để dùng làm đối chiếu với CV
     jd_index: int = Field(..., description="""
-                          Index or ID of the Job Description to compare against when analyzing CV content. If none: set to 4939 ## 3. JD Index
-            - If the request mentions a specific job, role, or reference number, extract the correct JD index (e.g. 7383).
+                          Index or ID of the Job Description to compare against when analyzing CV content. If none: set to 0 ## 3. JD Index
+            - If the request mentions a specific job, role, or reference number, extract the correct JD index (e.g. 213587904412769).
             - If no JD is mentioned or implied, return 0.""")
 
 CV_SYSTEM_PROMPT = """
@@ -79,12 +83,13 @@ Your job is to determine:
 User: "Review my cv"
 → { "next_step": "cv_format", "action_type": "review", "jd_index": "null" }
 
-User: "adjust/align/improve my cv for the job role (JD #4920)"
-→ { "next_step": "cv_content", "action_type": "rewrite", "jd_index": 4920 }
+User: "adjust/align/improve my cv for the job role (JD #213587904412769)"
+→ { "next_step": "cv_content", "action_type": "rewrite", "jd_index": 213587904412769 }
 
 # Notes
 - Always return all 3 fields.
 """
+@llm_node
 def cv_expert(state) -> Command:
     print("--cv--")
     print("----",type(state), state)
@@ -96,8 +101,8 @@ def cv_expert(state) -> Command:
             update={"messages": [AIMessage('CV is not uploaded yet')],'sender': 'cv_expert'},
         )
             
-    llm = get_llm_structured(CVExpertOutput)
-    response = llm.invoke([SystemMessage(CV_SYSTEM_PROMPT)] + state["messages"])
+    llm = get_llm_structured(CVExpertOutput, node="cv_expert")
+    response = yield llm, [SystemMessage(CV_SYSTEM_PROMPT)] + state["messages"]
     print('response: ', response)
     
     if response.next_step == 'cv_content':
@@ -128,20 +133,34 @@ def cv_expert(state) -> Command:
         if response.next_step == 'cv_content':
             
             if not jd:
-                try:
-                    jd = vector_store.get_by_ids([str(response.jd_index)])[0].page_content
-                    print(f'got {jd}')
-                except Exception as e:
-                    jd = vector_store.get_by_ids(['4942'])[0].page_content
-                    print(e)
+                jd = yield get_jd, str(response.jd_index)
+                if not jd:
+                    print(f'jd {response.jd_index} not found')
+                    return Command(
+                        goto = state['sender'],
+                        update={"messages": [AIMessage(f'JD {response.jd_index} not found. Search for jobs first or give the id of a listed JD.')],'sender': 'cv_expert'},
+                    )
+                print(f'got {jd}')
+                jd_id = str(response.jd_index)
+            else:
+                jd_id = None
             
             return Send('jd_extractor', {'sender': 'cv_expert','goto': response.action_type,
-                                    'jd': jd, 'cv': state['cv']})
+                                    'jd': jd, 'jd_id': jd_id, 'cv': state['cv']})
 
         return Send(response.next_step, {'sender': 'cv_expert','goto': response.action_type, 'cv': state['cv']})
                 
 
 from .schema import AgentState
+class FormatFeedback(BaseModel):
+    issue: str = Field(description="The issue identified by the human reviewer")
+    solution: str = Field(description="The solution to the issue identified by the human reviewer")
+    criteria: str = Field(description="The criteria used to evaluate the CV")
+
+class FormatFeedbacks(BaseModel):
+    feedbacks: list[FormatFeedback] = Field(description="The feedbacks from the human reviewers")
+
+@llm_node
 def format_reviewer(state: AgentState) -> Command:
     
     FORMAT_REVIEW_SYSTEM_PROMPT = """
@@ -213,22 +232,14 @@ You are an HR expert whose task is to review and evaluate a candidate’s CV bas
 
 After reviewing, return your feedback in the form of a checklist or structured list, pointing out both the problems and suggested improvements.
 """
-    class Feedback(BaseModel):
-        issue: str = Field(description="The issue identified by the human reviewer")
-        solution: str = Field(description="The solution to the issue identified by the human reviewer")
-        criteria: str = Field(description="The criteria used to evaluate the CV")
-            
-    class Feedbacks(BaseModel):
-        feedbacks: list[Feedback] = Field(description="The feedbacks from the human reviewers")
-    
     print('--review format--')
     if state['goto'] == 'review':
         # tra loi truc tiep
-        llm = get_llm()
+        llm = get_llm(node="format_reviewer")
     else:
-        llm = get_llm_structured(Feedbacks)
+        llm = get_llm_structured(FormatFeedbacks, node="format_reviewer")
         
-    response = llm.invoke([SystemMessage(FORMAT_REVIEW_SYSTEM_PROMPT), HumanMessage(f'Start review {state["cv"]} /no_think')])
+    response = yield llm, [SystemMessage(FORMAT_REVIEW_SYSTEM_PROMPT), HumanMessage(f'Start review {state["cv"]} /no_think')]
     
     print('--done review format--')
     
@@ -248,8 +259,7 @@ After reviewing, return your feedback in the form of a checklist or structured l
         )
         
 
-def jd_extractor(state):
-    EXTRACTOR_INSTRUCTION = """
+JD_EXTRACTOR_INSTRUCTION = """
 # Role and Objective  
 You are a Job Description (JD) analysis expert. Your mission is to deeply analyze the provided JD and extract key hiring signals that reveal the employer’s true expectations and priorities for the ideal candidate. You are not just listing what’s mentioned — you must infer deeper intent and structure your output clearly.
 
@@ -292,40 +302,54 @@ Final Note
 
 You are acting as a specialist whose job is to extract and interpret hiring intent behind job postings. Respond with only the structured output. Do not include any explanations, introductions, or summaries outside of the 5 required categories.
 """
-    class ExtractorOutput(BaseModel):
-        technical_skills: List[str] = Field(
-            ..., 
-            description="List of tools, technologies, programming languages, frameworks, platforms, or systems required or implied."
-        )
-        soft_skills: List[str] = Field(
-            ..., 
-            description="List of essential non-technical traits or behaviors expected for the role."
-        )
-        experience_requirements: List[str] = Field(
-            ..., 
-            description="Summarized expectations for years of experience, industries, project types, or job roles."
-        )
-        education_certifications: List[str] = Field(
-            ..., 
-            description="Degrees, majors, education levels, or certifications that are required or preferred."
-        )
-        hidden_insights: List[str] = Field(
-            ..., 
-            description="Inferred recruiter intent such as purpose of the role, ideal personality, timing, or underlying organizational needs."
-        )
-    
+
+# Bump when JD_EXTRACTOR_INSTRUCTION or ExtractorOutput change, so stored extractions are redone.
+# Own version: match_cv_jd stores the same schema under EXTRACTOR_VERSION from a different prompt.
+JD_EXTRACTOR_VERSION = "cv_agent-v1"
+
+def jd_extractor_steps(jd: str):
+    structured_llm = get_llm_structured(ExtractorOutput, node="jd_extractor")
+    return (yield structured_llm, [SystemMessage(JD_EXTRACTOR_INSTRUCTION), HumanMessage(f'Start extracting {jd}')])
+
+extract_jd_insights, aextract_jd_insights = sync_and_async(jd_extractor_steps)
+
+@llm_node
+def jd_extractor(state):
     print('--extract--')
     print(type(state), state.keys())
-    
-    
-    structured_llm = get_llm_structured(ExtractorOutput)
-    response = structured_llm.invoke(
-        [SystemMessage(EXTRACTOR_INSTRUCTION), HumanMessage(f'Start extracting {state["jd"]}')]
-    )
+
+    jd = state["jd"]
+    jd_id = state.get("jd_id")
+    model = node_profile("jd_extractor")["model"]
+    if jd_id:
+        # precomputed by setup_5_insights.py or stored by an earlier review of the same JD
+        cached = yield get_insights, ({jd_id: jd}, ExtractorOutput, JD_EXTRACTOR_VERSION, model)
+        if jd_id in cached:
+            print("--extract from insight store--")
+            return {"extractor_insights": cached[jd_id], 'goto': state["goto"]}
+
+    response = yield from jd_extractor_steps(jd)
+    if jd_id:
+        yield put_insights, ([(jd_id, jd, response)], JD_EXTRACTOR_VERSION, model)
     print("--done extract--")
     # return Send('analyze_cv', {"extractor_insights": response, "curriculum_vitae": state["curriculum_vitae"]})
     return {"extractor_insights": response, 'goto': state["goto"]}
         
+class AnalystFeedback(BaseModel):
+    name: Literal[
+        'technical_skills',
+        'soft_skills',
+        'experience_requirements',
+        'education_certifications',
+        'hidden_insights'
+    ] = Field(..., description="The criteria being evaluated.")
+    score: int = Field(..., description="Score from 0 to 10 reflecting how well the CV meets this requirement.")
+    comment: str = Field(..., description="Brief comment analyzing how well the CV fulfills this requirement.")
+
+class AnalystOutput(BaseModel):
+    feedbacks: List[AnalystFeedback] = Field(..., description="List of feedback items for each key requirement category.")
+
+@llm_node
 def cv_analyst(state):
     ANALYST_INSTRUCTION = """# Role and Objective
 You are a career analysis expert. Your mission is to evaluate how well a candidate's CV aligns with the key hiring criteria extracted from a job description (JD).
@@ -391,19 +415,6 @@ Assess whether the candidate seems to match the deeper intent behind the role (e
 ## JD Insights
 {insights}
 """
-    class Feedback(BaseModel):
-        name: Literal[
-            'technical_skills',
-            'soft_skills',
-            'experience_requirements',
-            'education_certifications',
-            'hidden_insights'
-        ] = Field(..., description="The criteria being evaluated.")
-        score: int = Field(..., description="Score from 0 to 10 reflecting how well the CV meets this requirement.")
-        comment: str = Field(..., description="Brief comment analyzing how well the CV fulfills this requirement.")
-
-    class AnalystOutput(BaseModel):
-        feedbacks: List[Feedback] = Field(..., description="List of feedback items for each key requirement category.")
     print("--analyze--")
     print(type(state), state.keys())
 
@@ -411,10 +422,8 @@ Assess whether the candidate seems to match the deeper intent behind the role (e
         insights = state["extractor_insights"]
     )
 
-    structured_llm = get_llm_structured(AnalystOutput)
-    response = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage(f'Start analyzing cv: {state["cv"]}')]
-    )
+    structured_llm = get_llm_structured(AnalystOutput, node="cv_analyst")
+    response = yield structured_llm, [SystemMessage(system_message), HumanMessage(f'Start analyzing cv: {state["cv"]}')]
     print("--done analyze--")
 
     # return Send('suggest_cv', {"insights": response, "curriculum_vitae": state["curriculum_vitae"]})
@@ -422,6 +431,32 @@ Assess whether the candidate seems to match the deeper intent behind the role (e
         
 
 
+class ImprovementSuggestion(BaseModel):
+    name: Literal[
+        'technical_skills',
+        'soft_skills',
+        'experience_requirements',
+        'education_certifications',
+        'hidden_insights'
+    ] = Field(..., description="The requirement category being evaluated.")
+
+    action_needed: Literal[
+        'yes',                 # CV can and should be improved for this aspect
+        'no',                  # This aspect is already strong, no changes needed
+        'cannot_be_improved'   # This gap reflects something that cannot realistically be improved through CV edits (e.g., lack of years of experience)
+    ] = Field(..., description="Whether the CV can be improved in this area.")
+
+    current_expression: str = Field(..., description="How the candidate has currently demonstrated or expressed this aspect in the CV. Paraphrase or quote relevant parts.")
+
+    recommendation: str = Field(..., description="Suggestion on what to change, emphasize, or reword in the CV. If no action is needed or not possible, explain why.")
+
+    suggested_keywords: List[str] = Field(..., description="List of relevant keywords (technologies, soft skills, etc.) to consider adding to improve alignment with the JD.")
+
+
+class SuggestorOutput(BaseModel):
+    suggestions: List[ImprovementSuggestion] = Field(..., description="List of improvement suggestions for each requirement category.")
+
+@llm_node
 def content_reviewer(state: AgentState):
     
     SUGGESTOR_INSTRUCTION = """# Role and Objective
@@ -462,32 +497,6 @@ You will receive a list of 5 feedback entries. Each entry includes:
 **Feedback List:**
 {insights}"""
     
-    class ImprovementSuggestion(BaseModel):
-        name: Literal[
-            'technical_skills',
-            'soft_skills',
-            'experience_requirements',
-            'education_certifications',
-            'hidden_insights'
-        ] = Field(..., description="The requirement category being evaluated.")
-        
-        action_needed: Literal[
-            'yes',                 # CV can and should be improved for this aspect
-            'no',                  # This aspect is already strong, no changes needed
-            'cannot_be_improved'   # This gap reflects something that cannot realistically be improved through CV edits (e.g., lack of years of experience)
-        ] = Field(..., description="Whether the CV can be improved in this area.")
-        
-        current_expression: str = Field(..., description="How the candidate has currently demonstrated or expressed this aspect in the CV. Paraphrase or quote relevant parts.")
-        
-        recommendation: str = Field(..., description="Suggestion on what to change, emphasize, or reword in the CV. If no action is needed or not possible, explain why.")
-        
-        suggested_keywords: List[str] = Field(..., description="List of relevant keywords (technologies, soft skills, etc.) to consider adding to improve alignment with the JD.")
-
-
-    class SuggestorOutput(BaseModel):
-        suggestions: List[ImprovementSuggestion] = Field(..., description="List of improvement suggestions for each requirement category.")
-
-
     print('--review content--')
     print(type(state), state.keys())
     
@@ -496,13 +505,11 @@ You will receive a list of 5 feedback entries. Each entry includes:
         insights = state["analyst_insights"]
     )
     if state['goto'] == 'review':
-        llm = get_llm()
+        llm = get_llm(node="content_reviewer")
     
     else:
-        llm = get_llm_structured(SuggestorOutput)
-    response = llm.invoke(
-        [SystemMessage(system_message), HumanMessage(f"Start reviewing cv: {state['cv']}")]
-    )
+        llm = get_llm_structured(SuggestorOutput, node="content_reviewer")
+    response = yield llm, [SystemMessage(system_message), HumanMessage(f"Start reviewing cv: {state['cv']}")]
     print('--done review content--')
     
     if state['goto'] == 'review':
@@ -531,6 +538,10 @@ You will receive a list of 5 feedback entries. Each entry includes:
 # ContentReviewer = workflow.compile()
 
 
+class WriterOutput(BaseModel):
+    new_cv: str = Field(..., description="The fully rewritten and improved CV based on the provided suggestions. The output should be clean, professional, and align closely with the job description.")
+
+@llm_node
 def cv_writer(state):
     
     WRITER_INSTRUCTION = """
@@ -576,10 +587,6 @@ Do not mention that this is an edited CV. Just return the improved CV text.
 """
 
 
-    class WriterOutput(BaseModel):
-        new_cv: str = Field(..., description="The fully rewritten and improved CV based on the provided suggestions. The output should be clean, professional, and align closely with the job description.")
-
-        
     print('--writer--')
     print(type(state), state)
     curriculum_vitae = state["cv"]
@@ -594,10 +601,8 @@ Do not mention that this is an edited CV. Just return the improved CV text.
     system_message = WRITER_INSTRUCTION.format(
         insights = insights
     )
-    llm = get_llm()
-    response = llm.invoke(
-        [SystemMessage(system_message), HumanMessage(f'Start rewriting cv: {curriculum_vitae} /no_think')]
-    )
+    llm = get_llm(node="cv_writer")
+    response = yield llm, [SystemMessage(system_message), HumanMessage(f'Start rewriting cv: {curriculum_vitae} /no_think')]
     # extractor = get_llm_structured(WriterOutput)
     # final = extractor.invoke([HumanMessage(f"""The following message contains a rewritten CV. Please extract **only the full CV text** from it.
     # Message:
@@ -18,8 +18,15 @@ from langgraph.prebuilt import InjectedState
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
-from agent.llm_provider import get_llm_structured, get_llm
+from agent.llm_provider import get_llm_structured, get_llm, node_profile
 from agent.tools.retrieve_pg_tools import vector_store
+from agent.jd_repository import get_jds
+from agent.tools.score_jd_tools import score_max_in_flight, score_timeout, score_max_jds
+from agent.tools.retrieve_pg_tools import cv_fingerprint
+from agent.score_store import get_scores, put_scores
+from agent.jd_insight_store import get_insights, put_insights
+from agent.summarizer import map_reduce_steps, summary_max_concurrency
+from agent.node_runner import llm_node, llm_tool, sync_and_async
 from langgraph.constants import Send
 from typing import Optional, Literal, List, Union, Dict, get_args
 import os 
@@ -36,6 +43,10 @@ SYNTHESIZE_SYSTEM_PROMPT = """You are an AI assistant helping users analyze job
 Your task is to extract and structure the main components of the job from the following description:
 Extract using the structured format.
 """
+# Own version for extractions made with SYNTHESIZE_SYSTEM_PROMPT: job_market_analysis
+# stores the same schema under JOB_CRITERIA_VERSION from a different prompt.
+# Bump when SYNTHESIZE_SYSTEM_PROMPT or JobCriteriaComparison change.
+SYNTHESIZE_CRITERIA_VERSION = "jd_agent-v1"
 class JobCriteriaComparison(BaseModel):
     job_responsibilities: str = Field(..., description="Key responsibilities listed in the job")
     technical_skills_tools: str = Field(..., description="Required technical skills or tools")
@@ -51,18 +62,26 @@ class JobCriteriaComparison(BaseModel):
 class AnalyzeState(MessagesState):
     jd: str
     jds: List[str]
+    jd_ids: List[str]
     jd_analysis: Annotated[list, add]
     jd_indices: list
     summary: str
 
 # ---------------------------- AGENT LOGIC ----------------------------
+# map-reduce summarization keeps large JD sets within NUM_CTX
+synthesize_max_jds = int(os.getenv("SYNTHESIZE_MAX_JDS", 100))
+
 def get_jd(state):
     print('--get_jd--', state)
-    jds = vector_store.get_by_ids([str(i) for i in state.get("jd_indices", '')])
-    if jds:
-        print('1------', jds)
-        jds = [jd.page_content for jd in jds]
-        return {"jds": jds}
+    requested = [str(i) for i in state.get("jd_indices", [])]
+    found = get_jds(requested)
+    if found:
+        print('1------', list(found))
+        # extractions already stored by an earlier synthesize call (same prompt version)
+        cached = get_insights(found, JobCriteriaComparison, SYNTHESIZE_CRITERIA_VERSION, node_profile("jd_parser")["model"])
+        jd_ids = [i for i in requested if i in found and i not in cached]
+        return {"jd_ids": jd_ids, "jds": [found[i] for i in jd_ids],
+                "jd_analysis": [cached[i] for i in requested if i in cached]}
     
     # print('2------', jds)
     else:
@@ -78,7 +97,9 @@ def router(state):
     if state.get("jds"):
         print('1------', )
         
-        return [Send("parser", {"jd": jd}) for jd in state['jds']]
+        return [Send("parser", {"jd_id": jd_id, "jd": jd}) for jd_id, jd in zip(state['jd_ids'], state['jds'])]
+    elif state.get("jd_analysis"):
+        return "summarize"
     else:
         print('2------', )
         # return 
@@ -87,15 +108,22 @@ def router(state):
                    
         update = {"messages": [AIMessage('fail to route')]})
 
+def synthesize_criteria_steps(jd: str):
+    llm = get_llm_structured(JobCriteriaComparison, node="jd_parser")
+    return (yield llm, [
+        SystemMessage(SYNTHESIZE_SYSTEM_PROMPT),
+        HumanMessage(f"Conduct extraction this jd :{jd}")
+    ])
+
+extract_synthesize_criteria, aextract_synthesize_criteria = sync_and_async(synthesize_criteria_steps)
+
+@llm_node
 def parser_agent(state): 
     print('--parser--')
     
     jd = state.get("jd", "")
-    llm = get_llm_structured(JobCriteriaComparison)
-    response = llm.invoke([
-        SystemMessage(SYNTHESIZE_SYSTEM_PROMPT),
-        HumanMessage(f"Conduct extraction this jd :{jd}")
-    ])
+    response = yield from synthesize_criteria_steps(jd)
+    yield put_insights, ([(state["jd_id"], jd, response)], SYNTHESIZE_CRITERIA_VERSION, node_profile("jd_parser")["model"])
     
     return Command(update = {"jd_analysis": [response]})
 
@@ -110,14 +138,11 @@ Your goal is to:
 4. Keep the summary in only about 300 words
 Use markdown formatting and bullet points/tables if appropriate.
 """
+@llm_node
 def summarize_agent(state):
     print('--summary--')
-    jd_analysis = state['jd_analysis']
-    llm = get_llm()
-    response = llm.invoke([
-        SystemMessage(SUMMARIZE_SYSTEM_PROMPT),
-        HumanMessage(f"Here are the analyses: {jd_analysis}. /no_think")
-    ])
+    analyses = [f"JD {i + 1}: {analysis.model_dump_json()}" for i, analysis in enumerate(state['jd_analysis'])]
+    response = AIMessage((yield from map_reduce_steps(analyses, SUMMARIZE_SYSTEM_PROMPT)))
     print("--response from summaize--", response)
     # return Command(goto = 'router',
     #     graph = Command.PARENT,
@@ -133,7 +158,7 @@ graph.add_node("parser", parser_agent)
 graph.add_node("summarize", summarize_agent)
 
 graph.set_entry_point("get_jd")
-graph.add_conditional_edges("get_jd", router, ["parser"])
+graph.add_conditional_edges("get_jd", router, ["parser", "summarize"])
 graph.add_edge("parser", "summarize")
 synthesize_agent = graph.compile()
 
@@ -262,18 +287,32 @@ class ScoreState(MessagesState):
     jds: List[str]
     scored_jds: Annotated[list | list[CVJDMatchFeedback], add]
     jd_indices: List[str]
+    missing_jds: List[str]
+    failed_jds: Annotated[list, add]
+    capped_jds: List[str]
+    cv_hash: str
     
 
 
 # ---------------------------- AGENT LOGIC ----------------------------
+# Bump when SCORE_PROMPT_SYSTEM or the weighted CVJDMatchFeedback change.
+SCORE_PROMPT_VERSION = "jd_agent-v1"
 
 def get_jd(state):
+    """Fetch stage of the score graph: one batched lookup, then the branches only call the LLM."""
     print('--get_jd--', state)
-    jds = vector_store.get_by_ids([str(i) for i in state.get("jd_indices", '')])
-    if jds:
-        print('1------', jds)
-        jds = [jd.page_content for jd in jds]
-        return {"jds": jds}
+    requested = [str(i) for i in state.get("jd_indices", [])]
+    found = get_jds(requested)
+    if found:
+        missing = [i for i in requested if i not in found]
+        if missing:
+            print(f"JDs not found: {missing}")
+        cv_hash = state.get("cv_hash") or cv_fingerprint(state["cv"])
+        cached = get_scores(cv_hash, found, SCORE_PROMPT_VERSION, node_profile("score")["model"])
+        print(f"score cache: {len(cached)} hits, {len(found) - len(cached)} misses")
+        jd_indices = [i for i in requested if i in found and i not in cached]
+        return {"jd_indices": jd_indices, "jds": [found[i] for i in jd_indices], "missing_jds": missing,
+                "cv_hash": cv_hash, "scored_jds": [CVJDMatchFeedback(**cached[i]) for i in requested if i in cached]}
     
     # print('2------', jds)
     else:
@@ -288,7 +327,10 @@ def router(state):
     print('--router--', state)
     
     if state.get("jds", []):
-        return [Send("score", {"jd": jd, "cv": state["cv"], 'jd_index': id}) for jd, id in zip(state["jds"], state["jd_indices"])]
+        return [Send("score", {"jd": jd, "cv": state["cv"], 'jd_index': id, "cv_hash": state["cv_hash"]}) for jd, id in zip(state["jds"], state["jd_indices"])]
+    elif state.get("scored_jds"):
+        # every JD was served from the score store
+        return "summarize"
     else:
         return Command(goto = 'jd_expert',
         graph = Command.PARENT,
@@ -296,30 +338,42 @@ def router(state):
         update = {"messages": [AIMessage('fail to route')]})
         
         
+@llm_node
 def score_agent(state): #: Annotated[ScoreState, InjectedState]):
     print("--score--")
     
     jd = state.get("jd", "")
     cv = state.get("cv", "")
     
-    llm = get_llm_structured(CVJDMatchFeedback)
-    response = llm.invoke([
-        SystemMessage(SCORE_PROMPT_SYSTEM),
-        HumanMessage(f"Conduct scoring job {state['jd_index']}: {jd} with cv: {cv} . /no_think")
-    ])
+    llm = get_llm_structured(CVJDMatchFeedback, timeout=score_timeout, node="score")
+    try:
+        response = yield llm, [
+            SystemMessage(SCORE_PROMPT_SYSTEM),
+            HumanMessage(f"Conduct scoring job {state['jd_index']}: {jd} with cv: {cv} . /no_think")
+        ]
+    except Exception as e:
+        print(f"scoring job {state['jd_index']} failed: {e}")
+        return {"failed_jds": [state["jd_index"]]}
     print(type(response), "response from score",  response)
-    print("state", state)
+    yield put_scores, (state["cv_hash"], [(state["jd_index"], jd, response.model_dump())], SCORE_PROMPT_VERSION, node_profile("score")["model"])
     return {"scored_jds": [response]}
 
+@llm_node
 def summarize_score_agent(state):
     print("--summa--")
     jd_analysis = state.get("scored_jds", [])
     print(state)
-    llm = get_llm()
-    response = llm.invoke([
+    missing = state.get("missing_jds", [])
+    failed = state.get("failed_jds", [])
+    note = f" Mention that these JDs were not found and were skipped: {missing}." if missing else ""
+    note += f" Mention that these JDs could not be scored in time: {failed}." if failed else ""
+    capped = state.get("capped_jds", [])
+    note += f" Mention that these JDs were not scored (over the {score_max_jds}-JD cap): {capped}." if capped else ""
+    llm = get_llm(node="score_summary")
+    response = yield llm, [
         SystemMessage(summary_instruction),
-        HumanMessage(f"Here are the analyses of jobs to compare: {jd_analysis}. /no_think")
-    ])
+        HumanMessage(f"Here are the analyses of jobs to compare: {jd_analysis}.{note} /no_think")
+    ]
     # print(response)
     # return Command(goto = 'router',
     #     graph = Command.PARENT,
@@ -336,7 +390,7 @@ def build_score_graph() -> StateGraph:
     score_graph.add_node("summarize", summarize_score_agent)
 
     score_graph.set_entry_point("get_jd")
-    score_graph.add_conditional_edges("get_jd", router, ["score"])    
+    score_graph.add_conditional_edges("get_jd", router, ["score", "summarize"])    
     score_graph.add_edge("score", "summarize")
 
     return score_graph.compile()
@@ -369,7 +423,7 @@ Never:
 """
 
  
-@tool
+@llm_tool
 def call_score_jds(jd_indices: List[int], cv: Annotated[str, InjectedState('cv')]):
     """
     Scores the user's CV against one or more job descriptions (JDs) to evaluate fit. You can also
@@ -379,13 +433,17 @@ def call_score_jds(jd_indices: List[int], cv: Annotated[str, InjectedState('cv')
         jd_indices (List[int]): One or more job description indices to compare against the user's CV.
 
     """
-    jd_indices = jd_indices[:2] or [4942, 7363]
-    response = score_agent.invoke({'jd_indices': jd_indices, 'cv': cv})
+    jd_indices, capped = jd_indices[:score_max_jds], [str(i) for i in jd_indices[score_max_jds:]]
+    if not jd_indices:
+        return {"messages": [AIMessage("No JD ids were given: search for jobs first, then pick JDs from the results.")]}
+    if capped:
+        print(f"scoring capped at {score_max_jds} JDs, not scored: {capped}")
+    response = yield score_agent.with_config(max_concurrency=score_max_in_flight), {'jd_indices': jd_indices, 'cv': cv, 'capped_jds': capped}
     
     # print(response)
     return response
 
-@tool
+@llm_tool
 def call_synthesize_jds(jd_indices: List[int]):
     """
      Summarizes and compares multiple job descriptions to extract insights, conduct market analysis about the job market, 
@@ -402,8 +460,10 @@ def call_synthesize_jds(jd_indices: List[int]):
         - Any anomalies or outliers
 
     """
-    jd_indices = jd_indices[:2] or [4942, 7363]
-    response = synthesize_agent.invoke({'jd_indices': jd_indices})
+    jd_indices = jd_indices[:synthesize_max_jds]
+    if not jd_indices:
+        return {"messages": [AIMessage("No JD ids were given: search for jobs first, then pick JDs from the results.")]}
+    response = yield synthesize_agent.with_config(max_concurrency=summary_max_concurrency), {'jd_indices': jd_indices}
     
     # print(response)
     return response
@@ -423,9 +483,10 @@ def call_job_searcher(task_title):
 
 from .schema import AgentState
 
+@llm_node
 def jd_agent_node(state: AgentState):
     print('--- jds expert ---')
-    llm = get_llm().bind_tools([call_score_jds, call_synthesize_jds, call_job_searcher])
+    llm = get_llm(node="jd_agent").bind_tools([call_score_jds, call_synthesize_jds, call_job_searcher])
     print('state:  ', state)
     
     # if isinstance(state["messages"][-1], ToolMessage):
@@ -433,10 +494,10 @@ def jd_agent_node(state: AgentState):
     #     return Command(goto = 'router')
     
     if isinstance(state.get('message_from_sender', ''), HumanMessage):
-        response = llm.invoke([SystemMessage(JD_SYSTEM_PROMPT)] + state["messages"]+ [state['message_from_sender']])
+        response = yield llm, [SystemMessage(JD_SYSTEM_PROMPT)] + state["messages"]+ [state['message_from_sender']]
         
     else:
-        response = llm.invoke([SystemMessage(JD_SYSTEM_PROMPT)] + state["messages"])
+        response = yield llm, [SystemMessage(JD_SYSTEM_PROMPT)] + state["messages"]
         
     print("jd response -----", response)
     
@@ -451,7 +512,7 @@ def jd_agent_node(state: AgentState):
         elif response.tool_calls[0]['name'] == 'call_score_jds':
             print("---------goi score", response.tool_calls[0])
             
-            response = call_score_jds.invoke({"jd_indices": response.tool_calls[0]['args'].get('jd_indices', [4942, 7363]), 'cv': state['cv']})
+            response = yield call_score_jds, {"jd_indices": response.tool_calls[0]['args'].get('jd_indices', []), 'cv': state['cv']}
             print("da co ket qua score, tra ve parenr: ",type(response), response)
             return Command(
                 goto = 'coordinator', graph = Command.PARENT, update = {'message_from_sender': response['messages'][-1]}
@@ -461,7 +522,7 @@ def jd_agent_node(state: AgentState):
         elif response.tool_calls[0]['name'] == 'call_synthesize_jds':
             print("---------goi synthe", response.tool_calls[0])
             
-            response = call_synthesize_jds.invoke({"jd_indices": response.tool_calls[0]['args'].get('jd_indices', [4394, 7276])})
+            response = yield call_synthesize_jds, {"jd_indices": response.tool_calls[0]['args'].get('jd_indices', [])}
             print("da co ket qua syn, tra ve parenr: ",type(response), response)
             
             return Command(
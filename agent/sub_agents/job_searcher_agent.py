@@ -28,6 +28,7 @@ from .schema import AgentState
 from agent.tools import job_search_by_cv as search_by_cv
 from agent.tools import job_search_by_query as search_by_keyword
 from langgraph.prebuilt import tools_condition, ToolNode
+from agent.node_runner import llm_node
 
 JOB_SEARCHER_SYSTEM_PROMPT = """
 You are an expert job search assistant. Your job is to help users find relevant job postings either by using specific keywords or by analyzing their CV.
@@ -52,11 +53,12 @@ MUST MUST return including job index/ jd id index of specific job (for example 1
 """
 
 
+@llm_node
 def job_agent_node(state: AgentState):
     print("--job searcher--")
     print("--state: ", state)
     # print("--message form sender", message_from_sender)
-    llm = get_llm().bind_tools([search_by_cv, search_by_keyword], )
+    llm = get_llm(node="job_searcher").bind_tools([search_by_cv, search_by_keyword], )
     messages = state["messages"]
     cv = state.get('cv', '')
     if cv:
@@ -68,14 +70,14 @@ def job_agent_node(state: AgentState):
         messages.append(HumanMessage('/no_think'))
         
     if isinstance(state.get('message_from_sender', ''), HumanMessage):
-        response = llm.invoke([SystemMessage(JOB_SEARCHER_SYSTEM_PROMPT + add_in)] + messages + [state['message_from_sender']])
+        response = yield llm, [SystemMessage(JOB_SEARCHER_SYSTEM_PROMPT + add_in)] + messages + [state['message_from_sender']]
         
         return {"messages": [state['message_from_sender'], response], 
                 'message_from_sender': '',
                 'sender': state['sender'], 
                 'jds': state['jds']}
     else:
-        response = llm.invoke([SystemMessage(JOB_SEARCHER_SYSTEM_PROMPT + add_in)] + messages)
+        response = yield llm, [SystemMessage(JOB_SEARCHER_SYSTEM_PROMPT + add_in)] + messages
         
         return {"messages": [response], 'sender': state['sender'], 'jds': state['jds']}
 
@@ -12,12 +12,15 @@ from pydantic import BaseModel, Field
 class AgentState(MessagesState):
     sender: str
     cv: Optional[str] 
+    cv_hash: Optional[str]
+    cv_embedding: Optional[list]
     jds: Annotated[list, add]
     sender: Optional[str]
     new_cv: Optional[str]
     chat_history_summary: str 
     last_index: int = 0
     jd: Optional[str] 
+    jd_id: Optional[str]
     extractor_insights: Optional[dict] 
     analyst_insights: Optional[dict] 
     suggestor_insights: Optional[dict] 
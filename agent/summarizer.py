@@ -0,0 +1,84 @@
+# summarizer.py
+# Hierarchical map-reduce summarization for inputs that do not fit in one NUM_CTX window.
+
+import os
+from langchain_core.messages import SystemMessage, HumanMessage
+from agent.llm_provider import get_llm, estimate_tokens, node_profile
+from agent.node_runner import sync_and_async
+
+summary_max_concurrency = int(os.getenv("SUMMARY_MAX_CONCURRENCY", 4))
+summary_fan_in = int(os.getenv("SUMMARY_FAN_IN", 4))
+summary_output_tokens = int(os.getenv("SUMMARY_OUTPUT_TOKENS", 700))
+
+merge_instruction = """You are merging partial summaries. Each partial summary below covers a different subset of the same set of items.
+
+Combine them into ONE summary that follows the original task:
+{task}
+
+Add up counts and keep every distinct pattern, difference or unique feature; drop repetitions.
+"""
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 3
+    return text if len(text) <= max_chars else text[:max_chars] + " ..."
+
+
+def chunk_by_tokens(texts: list[str], budget: int) -> list[list[str]]:
+    """Greedily pack texts, in order, into groups whose estimated size stays under `budget` tokens."""
+    groups, current, used = [], [], 0
+    for text in texts:
+        text = truncate_to_tokens(text, budget)
+        size = estimate_tokens(text)
+        if current and used + size > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _summarize_groups(llm, instruction: str, groups: list[list[str]], label: str):
+    requests = [
+        [SystemMessage(instruction), HumanMessage(f"Here are the {label}:\n\n" + "\n\n".join(group) + "\n/no_think")]
+        for group in groups
+    ]
+    # llm.map() runs the requests as one batch (abatch on the async path)
+    responses = yield llm.map().with_config(max_concurrency=summary_max_concurrency), requests
+    return [response.content for response in responses]
+
+
+def map_reduce_steps(texts: list[str], instruction: str, label: str = "analyses"):
+    """
+    Summarize `texts` with `instruction` without overflowing NUM_CTX.
+
+    Map: pack the texts into context-sized groups and summarize the groups in parallel.
+    Reduce: merge the partial summaries `summary_fan_in` at a time until one is left,
+    so the number of sequential rounds grows with log(groups).
+    Written as node steps: use `yield from` inside an `llm_node`, or call
+    `map_reduce_summarize` / `amap_reduce_summarize` directly.
+    """
+    if not texts:
+        return ""
+    llm = get_llm(node="summarize")
+    num_ctx = node_profile("summarize")["num_ctx"]
+    budget = num_ctx - estimate_tokens(instruction) - summary_output_tokens
+    groups = chunk_by_tokens(texts, budget)
+    print(f"--map-reduce summary: {len(texts)} items in {len(groups)} groups--")
+    partials = yield from _summarize_groups(llm, instruction, groups, label)
+
+    merge = merge_instruction.format(task=instruction)
+    merge_budget = num_ctx - estimate_tokens(merge) - summary_output_tokens
+    fan_in = max(2, summary_fan_in)
+    while len(partials) > 1:
+        # every partial gets an equal share of the window so each round really reduces
+        partials = [truncate_to_tokens(p, merge_budget // fan_in) for p in partials]
+        groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+        print(f"--merge round: {len(partials)} partial summaries -> {len(groups)}--")
+        partials = yield from _summarize_groups(llm, merge, groups, "partial summaries")
+    return partials[0]
+
+
+map_reduce_summarize, amap_reduce_summarize = sync_and_async(map_reduce_steps)
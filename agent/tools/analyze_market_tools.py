@@ -5,12 +5,17 @@ from langgraph.constants import Send
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 import operator
-from agent.tools.retrieve_pg_tools import vector_store
+from agent.jd_repository import get_jds
+from agent.jd_insight_store import get_insights, put_insights
+from agent.market_analytics import market_stats, format_market_stats
+from agent.tools.match_cv_jd_tools import EXTRACTOR_VERSION
+from agent.summarizer import map_reduce_steps
+from agent.node_runner import llm_node, llm_tool, sync_and_async
 from langchain_core.tools.base import InjectedToolCallId
 from langgraph.types import Command
  
 
-from agent.llm_provider import get_llm_structured, get_llm
+from agent.llm_provider import get_llm_structured, get_llm, node_profile
 
 # ---------------------------- PROMPTS ----------------------------
 analyze_instruction = """You are an AI assistant helping users analyze job descriptions.
@@ -36,6 +41,18 @@ Your goal is to:
 Use markdown formatting and bullet points/tables if appropriate.
 """
 
+narrative_instruction = """You are a hiring analyst AI assistant. You are given aggregated statistics computed over a set of job descriptions (JDs) for the same kind of role.
+
+Write a short market overview based ONLY on these numbers:
+1. The core skills most employers ask for, and which skills tend to be requested together.
+2. The typical experience level.
+3. Work mode and location patterns.
+4. A final insight for a candidate targeting this role.
+
+Quote the counts or percentages you rely on. Do not invent figures that are not in the tables.
+Use markdown formatting and bullet points if appropriate.
+"""
+
 # ---------------------------- SCHEMA ----------------------------
 class JobCriteriaComparison(BaseModel):
     job_responsibilities: str = Field(..., description="Key responsibilities listed in the job")
@@ -49,43 +66,76 @@ class JobCriteriaComparison(BaseModel):
     career_growth: str | None = Field(None, description="Mention of career growth or advancement opportunities")
     unique_aspects: str | None = Field(None, description="Any unique benefits or characteristics of the job")
 
+# Bump when analyze_instruction or JobCriteriaComparison change, so stored extractions are redone.
+JOB_CRITERIA_VERSION = "v1"
+
 class AnalyzeState(MessagesState):
     jd: str
     jds: List[str]
+    jd_ids: List[str]
     jd_analysis: Annotated[list, operator.add]
     jd_indices: list
     summary: str
 
 # ---------------------------- AGENT LOGIC ----------------------------
 def get_jd(state):
-    jds = vector_store.get_by_ids([str(i) for i in state["jd_indices"]])
-    jds = [jd.page_content for jd in jds]
-    return {"jds": jds}
+    """Fetch the JDs and take their extractions from the insight store; only misses go to `extract`."""
+    requested = [str(i) for i in state["jd_indices"]]
+    found = get_jds(requested)
+    cached = get_insights(found, JobCriteriaComparison, JOB_CRITERIA_VERSION, node_profile("jd_parser")["model"])
+    print(f"insight store: {len(cached)} hits, {len(found) - len(cached)} misses")
+    jd_ids = [i for i in requested if i in found and i not in cached]
+    return {
+        "jd_ids": jd_ids,
+        "jds": [found[i] for i in jd_ids],
+        "jd_analysis": [cached[i] for i in requested if i in cached],
+    }
 
 
 def router(state):
     """Route each JD into the extraction node"""
-    return [Send("extract", {"jd": jd}) for jd in state.get("jds", [])]
+    if not state.get("jds"):
+        return "summarize"
+    return [Send("extract", {"jd_id": jd_id, "jd": jd}) for jd_id, jd in zip(state["jd_ids"], state["jds"])]
 
-def extract_agent(state): 
-    jd = state.get("jd", "")
-    llm = get_llm_structured(JobCriteriaComparison)
-    response = llm.invoke([
+def criteria_steps(jd: str):
+    llm = get_llm_structured(JobCriteriaComparison, node="jd_parser")
+    return (yield llm, [
         SystemMessage(analyze_instruction.format(jd=jd)),
         HumanMessage("Conduct extraction")
     ])
+
+extract_jd_criteria, aextract_jd_criteria = sync_and_async(criteria_steps)
+
+@llm_node
+def extract_agent(state): 
+    jd = state.get("jd", "")
+    response = yield from criteria_steps(jd)
+    yield put_insights, ([(state["jd_id"], jd, response)], JOB_CRITERIA_VERSION, node_profile("jd_parser")["model"])
     
     return Command(update = {"jd_analysis": [response]})
 
+@llm_node
 def summarize_agent(state):
-    jd_analysis = state['jd_analysis']
-    llm = get_llm()
-    response = llm.invoke([
-        SystemMessage(summarize_instruction),
-        HumanMessage(f"Here are the analyses: {jd_analysis}. /no_think")
-    ])
-    # print("--response--", response)
-    return Command(update = {"summary": response.content})
+    try:
+        stats = yield market_stats, (state["jd_indices"], JOB_CRITERIA_VERSION, EXTRACTOR_VERSION)
+    except Exception as e:
+        print(f"market stats unavailable: {e}")
+        stats = None
+
+    llm = get_llm(node="market_summary")
+    if stats and stats["jds_with_insights"]:
+        # the LLM only narrates numbers aggregated in SQL
+        response = yield llm, [
+            SystemMessage(narrative_instruction),
+            HumanMessage(f"Here are the statistics:\n{format_market_stats(stats)}\n/no_think")
+        ]
+        return Command(update = {"summary": response.content})
+
+    # context-sized groups summarized in parallel, then merged in a tree
+    analyses = [f"JD {i + 1}: {analysis.model_dump_json()}" for i, analysis in enumerate(state['jd_analysis'])]
+    summary = yield from map_reduce_steps(analyses, summarize_instruction)
+    return Command(update = {"summary": summary})
 
 # ---------------------------- GRAPH ----------------------------
 analyze_graph = StateGraph(AnalyzeState)
@@ -94,7 +144,7 @@ analyze_graph.add_node("extract", extract_agent)
 analyze_graph.add_node("summarize", summarize_agent)
 
 analyze_graph.set_entry_point("get_jd")
-analyze_graph.add_conditional_edges("get_jd", router, ["extract"])
+analyze_graph.add_conditional_edges("get_jd", router, ["extract", "summarize"])
 
 analyze_graph.add_edge("extract", "summarize")
 analyze_graph.set_finish_point("summarize")
@@ -102,7 +152,7 @@ analyze_graph.set_finish_point("summarize")
 analyze_agent = analyze_graph.compile()
 
 # ---------------------------- TOOL ----------------------------
-@tool
+@llm_tool
 def job_market_analysis(jd_indices: list[str], tool_call_id: Annotated[str, InjectedToolCallId]):
     """
     Analyze and summarize a set of job descriptions (JDs) for a given job title.
@@ -112,6 +162,7 @@ def job_market_analysis(jd_indices: list[str], tool_call_id: Annotated[str, Inje
 
     Note:
         For effective market analysis, provide at least 5 JD indices. If not, use tool to find more.
+        Statistics are aggregated over all given JDs, so passing dozens or hundreds of indices is fine.
 
     Args:
         jd_indices (list[str]): List of job description IDs (in same domain/sector) to analyze. Minimum 5 recommended.
@@ -119,7 +170,7 @@ def job_market_analysis(jd_indices: list[str], tool_call_id: Annotated[str, Inje
     """
         # You should call `job_search_by_query` first to retrieve a list of related JD IDs.
     print("--tool: compare_jobs--")
-    response = analyze_agent.invoke({"jd_indices": jd_indices})
+    response = yield analyze_agent, {"jd_indices": jd_indices}
     
     
     return Command(
@@ -6,8 +6,10 @@ from langgraph.prebuilt import InjectedState
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
-from agent.llm_provider import get_llm_structured, get_llm
-from agent.tools.retrieve_pg_tools import vector_store
+from agent.llm_provider import get_llm_structured, get_llm, node_profile
+from agent.jd_repository import get_jd
+from agent.jd_insight_store import get_insights, put_insights
+from agent.node_runner import llm_node, llm_tool, sync_and_async
 from langgraph.constants import Send
 from typing import Optional, Literal, List, Union, Dict, get_args
 import os 
@@ -88,25 +90,41 @@ class ExtractorOutput(BaseModel):
         description="Inferred recruiter intent such as purpose of the role, ideal personality, timing, or underlying organizational needs."
     )
 
+# Bump when EXTRACTOR_INSTRUCTION or ExtractorOutput change, so stored extractions are redone.
+EXTRACTOR_VERSION = "v1"
+
 class ExtractorInput(TypedDict):
     job_description: str
     curriculum_vitae: str
     
     
+def extractor_steps(job_description: str):
+    system_message = EXTRACTOR_INSTRUCTION.format(
+        job_description=job_description,
+    )
+
+    structured_llm = get_llm_structured(ExtractorOutput, node="jd_extractor")
+    return (yield structured_llm, [SystemMessage(system_message), HumanMessage('Start extracting')])
+
+run_extractor, arun_extractor = sync_and_async(extractor_steps)
+
+@llm_node
 def extract_jd(state):
     print('--extract--')
     print(type(state), state)
     
     job_description = state["job_description"]
-    
-    system_message = EXTRACTOR_INSTRUCTION.format(
-        job_description=job_description,
-    )
+    job_index = state.get("job_index")
 
-    structured_llm = get_llm_structured(ExtractorOutput)
-    response = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Start extracting')]
-    )
+    if job_index:
+        cached = yield get_insights, ({job_index: job_description}, ExtractorOutput, EXTRACTOR_VERSION, node_profile("jd_extractor")["model"])
+        if job_index in cached:
+            print("--extract from insight store--")
+            return {"extractor_insights": cached[job_index]}
+
+    response = yield from extractor_steps(job_description)
+    if job_index:
+        yield put_insights, ([(job_index, job_description, response)], EXTRACTOR_VERSION, node_profile("jd_extractor")["model"])
     print("--done extract--")
     # return Send('analyze_cv', {"extractor_insights": response, "curriculum_vitae": state["curriculum_vitae"]})
     return {"extractor_insights": response}
@@ -201,6 +219,7 @@ class AnalystInput(TypedDict):
     insights: str
     curriculum_vitae: str
 
+@llm_node
 def analyze_cv(state):
     print('--analyze--')
     print(type(state), state)
@@ -213,10 +232,8 @@ def analyze_cv(state):
         insights = insights
     )
 
-    structured_llm = get_llm_structured(AnalystOutput)
-    response = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Start analyzing')]
-    )
+    structured_llm = get_llm_structured(AnalystOutput, node="cv_analyst")
+    response = yield structured_llm, [SystemMessage(system_message), HumanMessage('Start analyzing')]
     print("--done analyze--")
 
     # return Send('suggest_cv', {"insights": response, "curriculum_vitae": state["curriculum_vitae"]})
@@ -297,6 +314,7 @@ class SuggestorInput(TypedDict):
     insights: str
     curriculum_vitae: str
 
+@llm_node
 def suggest_cv(state):
     print('--suggest--')
     print(type(state), state)
@@ -308,10 +326,8 @@ def suggest_cv(state):
         insights = insights
     )
 
-    structured_llm = get_llm_structured(SuggestorOutput)
-    response = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Start analyzing')]
-    )
+    structured_llm = get_llm_structured(SuggestorOutput, node="cv_suggestor")
+    response = yield structured_llm, [SystemMessage(system_message), HumanMessage('Start analyzing')]
     print('--done suggest--')
 
     # return Send('write_cv', {"insights": response, "curriculum_vitae": state["curriculum_vitae"]})
@@ -376,6 +392,7 @@ class WriterInput(TypedDict):
     insights: str
     curriculum_vitae: str
 
+@llm_node
 def writer_cv(state):
     print('--writer--')
     print(type(state), state)
@@ -386,20 +403,19 @@ def writer_cv(state):
         curriculum_vitae = curriculum_vitae,
         insights = insights
     )
-    llm = get_llm()
-    response = llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Start rewriting /no_think')]
-    )
-    extractor = get_llm_structured(WriterOutput)
-    final = extractor.invoke([HumanMessage(f"""The following message contains a rewritten CV. Please extract **only the full CV text** from it.
+    llm = get_llm(node="cv_writer")
+    response = yield llm, [SystemMessage(system_message), HumanMessage('Start rewriting /no_think')]
+    extractor = get_llm_structured(WriterOutput, node="cv_writer")
+    final = yield extractor, [HumanMessage(f"""The following message contains a rewritten CV. Please extract **only the full CV text** from it.
     Message:
-    {response.content}""")])
+    {response.content}""")]
     print('--done write--')
     
     return final
 
 # ---------------------------- COMBINED FLOW ----------------------------
 class AgentState(TypedDict):
+    job_index: str
     job_description: str
     curriculum_vitae: str
     extractor_insights: dict
@@ -425,7 +441,7 @@ match_cv_jd_agent = workflow.compile()
 
 
 # ----------------------------- TOOL WRAPPER -----------------------------
-@tool
+@llm_tool
 def match_cv_jd(job_index: str, cv: Annotated[str, InjectedState("cv")], tool_call_id: Annotated[str, InjectedToolCallId]):
     """Analyze and tailor a CV to match a specific job description.
 
@@ -446,17 +462,16 @@ def match_cv_jd(job_index: str, cv: Annotated[str, InjectedState("cv")], tool_ca
     if not cv:
         raise FileExistsError('CV is not uploaded yet.')
 
-    jd = vector_store.get_by_ids([job_index])[0]
+    jd = yield get_jd, job_index
     
     if not jd:
         raise FileExistsError('JD is not available.')
-        
-    jd = jd.page_content
 
-    result = match_cv_jd_agent.invoke({
+    result = yield match_cv_jd_agent, {
+        "job_index": str(job_index),
         "job_description": jd,
         "curriculum_vitae": cv,
-    })
+    }
 
     print(result)
     # result = result.dict()
@@ -7,7 +7,7 @@ from typing import Literal
 
 from langgraph.graph import MessagesState
 @tool
-def recall_history_chat(query: str, config: RunnableConfig, store: Annotated[BaseStore, InjectedStore]):
+async def recall_history_chat(query: str, config: RunnableConfig, store: Annotated[BaseStore, InjectedStore]):
     """
     Retrieve contextually relevant content, enables retrieval based on meaning, not just exact keywords, useful for:
     - Precisely recall of previous user queries or instructions
@@ -23,7 +23,8 @@ def recall_history_chat(query: str, config: RunnableConfig, store: Annotated[Bas
     user_id = config["configurable"].get("user_id","")
     if user_id:
         namespace = ("chat_history", user_id)
-        related_messages = store.search(namespace, query=query, limit=3)
+        # the graph runs on AsyncPostgresStore: its sync methods must not be called from the event loop
+        related_messages = await store.asearch(namespace, query=query, limit=3)
         threshold = 0.5
         info = "\n".join([d.value["data"] for d in related_messages if d.score > threshold])
         print(info)
@@ -35,7 +36,7 @@ def recall_history_chat(query: str, config: RunnableConfig, store: Annotated[Bas
 
 
 @tool
-def recall_state(query: Literal[
+async def recall_state(query: Literal[
     'cv', 
     'new_cv', 
     'cv_reviews', 
@@ -65,5 +66,7 @@ def recall_state(query: Literal[
         Any: The value associated with the specified query key from the state, or "Empty" if not found.
     """
     print("--tool9: get state--")
-    from trigger_function.backend import graph
-    return graph.get_state({"configurable": {"thread_id": config['metadata']['thread_id']}}).values.get(query, "Not available")
+    from trigger_function.backend import get_graph
+    graph = await get_graph()  # built lazily on the async checkpointer
+    snapshot = await graph.aget_state({"configurable": {"thread_id": config['metadata']['thread_id']}})
+    return snapshot.values.get(query, "Not available")
@@ -7,6 +7,7 @@ from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
 from agent.llm_provider import get_llm_structured, get_llm
+from agent.node_runner import llm_node, llm_tool
 
 # ----------------------------- SCHEMAS -----------------------------
 class Feedback(BaseModel):
@@ -132,6 +133,7 @@ Instructions:
 """
 
 # --------------------------- AGENT NODES ---------------------------
+@llm_node
 def suggest_cv(state: SuggestChangeState):
     print('--suggest--')
     candidate_cv = state["candidate_cv"]
@@ -140,13 +142,12 @@ def suggest_cv(state: SuggestChangeState):
         candidate_cv=candidate_cv,
     )
 
-    structured_llm = get_llm_structured(Feedbacks)
-    feedbacks = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Let start the review process /no_think')]
-    )
+    structured_llm = get_llm_structured(Feedbacks, node="review_cv")
+    feedbacks = yield structured_llm, [SystemMessage(system_message), HumanMessage('Let start the review process /no_think')]
 
     return {'review': feedbacks.feedbacks}
 
+@llm_node
 def adjust_cv(state: SuggestChangeState) -> ReviewedCV:
     print('--adjust--')
     candidate_cv = state["candidate_cv"]
@@ -162,18 +163,15 @@ def adjust_cv(state: SuggestChangeState) -> ReviewedCV:
         criteria=criteria,
     )
 
-    structured_llm = get_llm()
-    response = structured_llm.invoke(
-        [SystemMessage(system_message), HumanMessage('Let start the adjust process /no_think')]
-    )
+    structured_llm = get_llm(node="adjust_cv")
+    response = yield structured_llm, [SystemMessage(system_message), HumanMessage('Let start the adjust process /no_think')]
     print("------   ",response)
     
-    extractor = get_llm_structured(ReviewedCV)
-    extracted = extractor.invoke([
+    extractor = get_llm_structured(ReviewedCV, node="adjust_cv")
+    extracted = yield extractor, [
                 SystemMessage("You are a curriculum vitae extractor that helps parser raw cv with markdown."),
                 HumanMessage(f"Here is a messages contain cv content \n {response.content} /no_think")
             ]
-        )
 
     return {'new_cv': extracted.new_cv}
 
@@ -200,7 +198,7 @@ workflow.set_finish_point('change')
 review_agent = workflow.compile()
 
 # ----------------------------- TOOL WRAPPER -----------------------------
-@tool
+@llm_tool
 def review_cv(cv: Annotated[str, InjectedState("cv")], tool_call_id: Annotated[str, InjectedToolCallId]):
     """Analyze and edit a CV without referencing any specific job description.
 
@@ -218,9 +216,9 @@ def review_cv(cv: Annotated[str, InjectedState("cv")], tool_call_id: Annotated[s
     if not cv:
         raise FileExistsError('CV is not uploaded yet.')
 
-    result = review_agent.invoke({
+    result = yield review_agent, {
         "candidate_cv": cv,
-    })
+    }
     print(type(result), result)
 
     # result = result.model_dump()
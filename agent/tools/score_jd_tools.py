@@ -1,17 +1,43 @@
+import os
+import re
 from typing import List, Annotated
 from langgraph.graph import StateGraph, MessagesState
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
 import operator
 from langgraph.constants import Send
 from pydantic import BaseModel, Field, model_validator
-from agent.tools.retrieve_pg_tools import vector_store
+from agent.jd_repository import get_jds
+from agent.score_store import get_scores, put_scores
+from agent.tools.retrieve_pg_tools import cv_fingerprint, get_cv_embedding, similarity_to_jds
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.tools import tool
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
 
 # Import LLM model and prompts from external module
-from agent.llm_provider import get_llm_structured
+from agent.llm_provider import get_llm_structured, estimate_tokens, node_profile
+from agent.node_runner import llm_node, llm_tool
+
+# Scoring executor limits: how many score branches run at once, how long one LLM
+# call may take, and how many JDs a single request may score.
+score_max_in_flight = int(os.getenv("SCORE_MAX_IN_FLIGHT", 4))
+score_timeout = float(os.getenv("SCORE_TIMEOUT", 60))
+score_max_jds = int(os.getenv("SCORE_MAX_JDS", 50))
+
+# Batch mode: score several compact JD digests against one copy of the CV per call.
+score_mode = os.getenv("SCORE_MODE", "single")
+score_digest_chars = int(os.getenv("SCORE_DIGEST_CHARS", 1500))
+score_batch_max = int(os.getenv("SCORE_BATCH_MAX", 8))
+score_output_tokens = int(os.getenv("SCORE_OUTPUT_TOKENS", 250))
+
+# Pre-ranking: when more than SCORE_LLM_TOP_M JDs need scoring, rank them by CV/JD
+# embedding similarity and only send the top M to the LLM (0 disables pre-ranking).
+score_llm_top_m = int(os.getenv("SCORE_LLM_TOP_M", 10))
+score_prerank_max = int(os.getenv("SCORE_PRERANK_MAX", 200))
+
+# Bump when score_instruction / batch_score_instruction / CVJDMatchFeedback change,
+# so cached scores from the old prompt are no longer served.
+SCORE_PROMPT_VERSION = "score_jobs-v1"
 
 # ---------------------------- PROMPT ----------------------------
 # Prompt dùng để chấm điểm CV theo từng JD
@@ -38,6 +64,31 @@ Then, write an **overall comment** explaining the fit in 1–3 sentences.
 Please return the scores and comment in the expected structured format.
 """
 
+# Prompt dùng để chấm điểm CV theo nhiều JD trong một lần gọi
+batch_score_instruction = """You are an AI assistant helping HR evaluate job candidates.
+
+Your task is to evaluate one candidate’s fit against EACH of the job descriptions (JDs) listed below.
+
+For every JD, score the candidate from 0 to 10 across the following criteria:
+1. Job title relevance
+2. Years of experience
+3. Required skills match
+4. Education & certifications
+5. Project & work history relevance
+6. Soft skills & language
+
+Then, write an **overall comment** explaining the fit in 1–3 sentences.
+Return exactly one evaluation per JD and set `id` to the JD index shown in its header.
+
+### Candidate CV:
+{cv}
+
+### Job Descriptions:
+{jds}
+
+Please return the list of evaluations in the expected structured format.
+"""
+
 # Prompt dùng để tổng hợp các đánh giá thành 1 đoạn summary
 summary_instruction = """You are an AI assistant summarizing HR evaluations.
 
@@ -76,6 +127,22 @@ class CVJDMatchFeedback(BaseModel):
         ) / 6, 2)
         return self
 
+class ApproxJDMatch(BaseModel):
+    """Embedding-similarity estimate for a JD that was ranked out of LLM scoring."""
+    id: str = Field(..., description="Job index")
+    similarity: float = Field(..., description="Cosine relevance (0-1) between the CV and JD embeddings.")
+    overall_fit_score: float = Field(..., description="Approximate fit (0-10) derived from similarity.")
+    approximate: bool = True
+
+def format_approx_list(approx_list: list[ApproxJDMatch]) -> str:
+    lines = ["Approximate fit (embedding similarity only, not scored by the LLM):"]
+    for m in approx_list:
+        lines.append(f"- Job Index {m.id}: ~{m.overall_fit_score}/10")
+    return "\n".join(lines)
+
+class CVJDBatchFeedback(BaseModel):
+    scores: list[CVJDMatchFeedback] = Field(..., description="One evaluation per job description, in the order given.")
+
 def format_cvjd_feedback_list(feedback_list: list[CVJDMatchFeedback]) -> str:
     output = []
     for fb in feedback_list:
@@ -105,32 +172,141 @@ class ScoreState(MessagesState):
     jds: List[str]
     scored_jds: Annotated[list | list[CVJDMatchFeedback], operator.add]
     jd_indices: List[str]
+    missing_jds: List[str]
+    failed_jds: Annotated[list, operator.add]
+    batch: bool
+    cv_hash: str
+    cv_embedding: list
+    approx_jds: List[ApproxJDMatch]
     
 
 
 # ---------------------------- AGENT LOGIC ----------------------------
-def do_nothing(state):
-    pass
+def prompt_version(state) -> str:
+    return SCORE_PROMPT_VERSION + ("-batch" if state.get("batch") else "")
+
+def score_model(state) -> str:
+    """Model of the node that scores this state; stored scores are only reused for the same model."""
+    return node_profile("score_batch" if state.get("batch") else "score")["model"]
+
+def fetch_jds(state):
+    """
+    Load every requested JD in one batch before the fan-out; unknown ids are dropped.
+    JDs already scored against this CV are served from the score store and skip the LLM.
+    """
+    print("--fetch_jds--")
+    requested = [str(i) for i in state.get("jd_indices", [])]
+    found = get_jds(requested)
+    missing = [i for i in requested if i not in found]
+    if missing:
+        print(f"JDs not found: {missing}")
+
+    cv_hash = state.get("cv_hash") or cv_fingerprint(state["cv"])
+    cached = get_scores(cv_hash, found, prompt_version(state), score_model(state))
+    print(f"score cache: {len(cached)} hits, {len(found) - len(cached)} misses")
+
+    jd_indices = [i for i in requested if i in found and i not in cached]
+    jd_indices, approx, unranked = prerank(state, jd_indices)
+    return {
+        "jd_indices": jd_indices,
+        "jds": [found[i] for i in jd_indices],
+        "missing_jds": missing,
+        "cv_hash": cv_hash,
+        "scored_jds": [CVJDMatchFeedback(**cached[i]) for i in requested if i in cached],
+        "approx_jds": approx,
+        "failed_jds": unranked,
+    }
+
+def prerank(state, jd_indices: list[str]) -> tuple[list[str], list[ApproxJDMatch], list[str]]:
+    """
+    Keep the top SCORE_LLM_TOP_M JDs by embedding similarity; the rest get an approximate score.
+    Returns (JDs for the LLM, approximate matches, JDs left unscored because ranking failed).
+    """
+    if not score_llm_top_m or len(jd_indices) <= score_llm_top_m:
+        return jd_indices, [], []
+    try:
+        similarity = similarity_to_jds(get_cv_embedding(state), jd_indices)
+    except Exception as e:
+        # no similarity to rank or estimate with: the JDs past the cap are reported as not scored
+        print(f"pre-ranking skipped: {e}")
+        return jd_indices[:score_llm_top_m], [], jd_indices[score_llm_top_m:]
+    ranked = sorted(jd_indices, key=lambda i: similarity.get(i, 0.0), reverse=True)
+    print(f"pre-ranked {len(ranked)} JDs, top {score_llm_top_m} go to the LLM")
+    approx = [ApproxJDMatch(id=i, similarity=round(similarity.get(i, 0.0), 4), overall_fit_score=round(similarity.get(i, 0.0) * 10, 2))
+              for i in ranked[score_llm_top_m:]]
+    return ranked[:score_llm_top_m], approx, []
+
+def jd_digest(jd: str, max_chars: int = score_digest_chars) -> str:
+    """Compact a JD for batch scoring: collapse whitespace and cut to `max_chars`."""
+    jd = re.sub(r"\s+", " ", jd).strip()
+    return jd if len(jd) <= max_chars else jd[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+def score_batch_size(cv: str, digests: list[str]) -> int:
+    """How many JD digests fit next to the CV in one prompt, given the score_batch num_ctx."""
+    if not digests:
+        return 1
+    budget = node_profile("score_batch")["num_ctx"] - estimate_tokens(batch_score_instruction + cv)
+    per_jd = max(estimate_tokens(d) for d in digests) + score_output_tokens
+    return max(1, min(score_batch_max, budget // per_jd))
 
 def router(state):
     print("--router--")
-    return [Send("score", {"jd_index": id, "cv": state["cv"]}) for id in state.get("jd_indices", [])]
-
+    if not state.get("jds"):
+        # nothing left to score: every JD was missing or served from the score store
+        return "summarize"
+    if not state.get("batch"):
+        return [Send("score", {"jd_index": id, "jd": jd, "cv": state["cv"], "cv_hash": state["cv_hash"]})
+                for id, jd in zip(state["jd_indices"], state["jds"])]
+
+    items = list(zip(state["jd_indices"], state["jds"]))
+    size = score_batch_size(state["cv"], [jd_digest(jd) for _, jd in items])
+    print(f"batch scoring {len(items)} JDs, {size} per call")
+    return [Send("score_batch", {"items": items[i:i + size], "cv": state["cv"], "cv_hash": state["cv_hash"], "batch": True})
+            for i in range(0, len(items), size)]
+
+@llm_node
 def score_agent(state): #: Annotated[ScoreState, InjectedState]):
     print("--score--")
     
-    jd = vector_store.get_by_ids([state["jd_index"]])[0].page_content
+    jd = state["jd"]
     cv = state.get("cv", "")
     
-    llm = get_llm_structured(CVJDMatchFeedback)
-    response = llm.invoke([
-        SystemMessage(score_instruction.format(cv=cv, jd=jd)),
-        HumanMessage(f"Conduct scoring job {state['jd_index']}. /no_think")
-    ])
+    llm = get_llm_structured(CVJDMatchFeedback, timeout=score_timeout, node="score")
+    try:
+        response = yield llm, [
+            SystemMessage(score_instruction.format(cv=cv, jd=jd)),
+            HumanMessage(f"Conduct scoring job {state['jd_index']}. /no_think")
+        ]
+    except Exception as e:
+        # One slow or malformed branch must not discard the scores of the others.
+        print(f"scoring job {state['jd_index']} failed: {e}")
+        return {"failed_jds": [state["jd_index"]]}
     print(type(response), "response from score",  response)
-    print("state", state)
+    yield put_scores, (state["cv_hash"], [(state["jd_index"], jd, response.model_dump())], prompt_version(state), score_model(state))
     return {"scored_jds": [response]}
 
+@llm_node
+def score_batch_agent(state):
+    print("--score_batch--")
+    items = state["items"]
+    jds = "\n\n".join(f"#### JD {id}\n{jd_digest(jd)}" for id, jd in items)
+
+    llm = get_llm_structured(CVJDBatchFeedback, timeout=score_timeout * len(items), node="score_batch")
+    try:
+        response = yield llm, [
+            SystemMessage(batch_score_instruction.format(cv=state.get("cv", ""), jds=jds)),
+            HumanMessage(f"Conduct scoring jobs {', '.join(id for id, _ in items)}. /no_think")
+        ]
+    except Exception as e:
+        print(f"batch scoring {[id for id, _ in items]} failed: {e}")
+        return {"failed_jds": [id for id, _ in items]}
+
+    requested = dict(items)
+    scored = [fb for fb in response.scores if str(fb.id) in requested]
+    returned = {str(fb.id) for fb in scored}
+    yield put_scores, (state["cv_hash"], [(str(fb.id), requested[str(fb.id)], fb.model_dump()) for fb in scored], prompt_version(state), score_model(state))
+    return {"scored_jds": scored, "failed_jds": [id for id, _ in items if id not in returned]}
+
 def summarize_score_agent(state):
     print("--summa--")
     # jd_analysis = state.get("scored_jds", [])
@@ -146,13 +322,15 @@ def summarize_score_agent(state):
 
 def build_score_graph() -> StateGraph:
     score_graph = StateGraph(ScoreState)
-    score_graph.add_node("do_nothing", do_nothing)
+    score_graph.add_node("fetch_jds", fetch_jds)
     score_graph.add_node("score", score_agent)
+    score_graph.add_node("score_batch", score_batch_agent)
     score_graph.add_node("summarize", summarize_score_agent)
 
-    score_graph.set_entry_point("do_nothing")
-    score_graph.add_conditional_edges("do_nothing", router, ["score"])    
+    score_graph.set_entry_point("fetch_jds")
+    score_graph.add_conditional_edges("fetch_jds", router, ["score", "score_batch", "summarize"])    
     score_graph.add_edge("score", "summarize")
+    score_graph.add_edge("score_batch", "summarize")
     score_graph.set_finish_point("summarize")
 
     return score_graph.compile()
@@ -165,26 +343,46 @@ score_agent = build_score_graph()
 # ---------------------------- TOOL ----------------------------
 from langgraph.prebuilt import InjectedState
 from langchain_core.tools import tool
-@tool
-def score_jobs(jd_index: list[str], cv: Annotated[str, InjectedState("cv")], tool_call_id: Annotated[str, InjectedToolCallId]):
+@llm_tool
+def score_jobs(jd_index: list[str], state: Annotated[dict, InjectedState], tool_call_id: Annotated[str, InjectedToolCallId], batch: bool = score_mode == "batch"):
     """
     Evaluate how well a given CV matches a list of job descriptions (JDs) by scoring each JD individually.
+    For long lists, only the JDs closest to the CV are fully scored; the rest get an approximate score.
 
     Args:
         jd_index (list[str]): List of indices identifying the job descriptions to compare against the CV.
+        batch (bool): Score several JDs per LLM call against a single copy of the CV. Faster for many JDs.
 
     Returns:
         dict: A structured summary that includes evaluation scores and comments highlighting the candidate's fit across all selected JDs.
     """
     print("--tool6: score--")
     # jd_index = [str(i) for i in jd_index]
+    cv = state.get("cv", "")
     if not cv:
-        raise "This tool can be executed because curriculum vitae is not uploaded yet"
-    response = score_agent.invoke({"jd_indices": jd_index, "cv": cv})
+        raise FileExistsError("This tool can be executed because curriculum vitae is not uploaded yet")
+    limit = score_prerank_max if score_llm_top_m else score_max_jds
+    capped = [str(i) for i in jd_index[limit:]]
+    if capped:
+        print(f"scoring capped at {limit} of {len(jd_index)} JDs")
+        jd_index = jd_index[:limit]
+    cv_hash = cv_fingerprint(cv)
+    cv_embedding = state.get("cv_embedding") if state.get("cv_hash") == cv_hash else None
+    response = yield score_agent.with_config(max_concurrency=score_max_in_flight), {
+        "jd_indices": jd_index, "cv": cv, "batch": batch, "cv_hash": cv_hash, "cv_embedding": cv_embedding or [],
+    }
     # return response
     
-    print("length: ", len(response['scored_jds']))
-    formated_response = format_cvjd_feedback_list(response['scored_jds'])
+    print("length: ", len(response.get('scored_jds', [])))
+    formated_response = format_cvjd_feedback_list(response.get('scored_jds', []))
+    if response.get("approx_jds"):
+        formated_response += "\n" + format_approx_list(response["approx_jds"])
+    if response.get("missing_jds"):
+        formated_response += f"\nJDs not found and skipped: {', '.join(response['missing_jds'])}"
+    if response.get("failed_jds"):
+        formated_response += f"\nJDs that could not be scored: {', '.join(map(str, response['failed_jds']))}"
+    if capped:
+        formated_response += f"\nJDs not scored (over the {limit}-JD cap): {', '.join(capped)}"
     print("formated:", format)
     return Command(
         update={
@@ -33,14 +33,17 @@ import json
 import uuid
 from pydantic import BaseModel, Field
 from psycopg import connect
+from psycopg_pool import AsyncConnectionPool
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import ToolMessage, SystemMessage, AIMessage, HumanMessage
-from langchain_ollama import OllamaEmbeddings
+from .embedding_provider import get_embeddings
 from langgraph.graph import MessagesState, StateGraph, END
 from langgraph.types import Command
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.store.postgres import PostgresStore
 from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.store.postgres.aio import AsyncPostgresStore
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from .llm_provider import get_llm_structured, get_llm
 from operator import add
 
@@ -99,6 +102,9 @@ class Memory(BaseModel):
         description="Any other preferences mentioned by the user, e.g., remote work, specific industries."
     )
     
+
+class SummarizeOutput(BaseModel):
+    updated_summary: str = Field(..., description="Tóm tắt đã được cập nhật sau khi bao gồm các messages mới")
     
 
 
@@ -139,7 +145,7 @@ class CareerAgent:
         """Use structured LLM output to extract user memory from new messages."""
         print("---EXTRACT USER INFO---")
 
-        extractor = get_llm_structured(Memory)
+        extractor = get_llm_structured(Memory, node="memory_extractor")
         user_id = config["configurable"].get("user_id", "")
         namespace = ("user_info", user_id)
 
@@ -198,9 +204,7 @@ class CareerAgent:
 
         current_summary = state.get("chat_history_summary", "")
         
-        class SummarizeOutput(BaseModel):
-            updated_summary: str = Field(..., description="Tóm tắt đã được cập nhật sau khi bao gồm các messages mới")
-        model = get_llm_structured(SummarizeOutput)
+        model = get_llm_structured(SummarizeOutput, node="message_summarizer")
 
         response = model.invoke([
             SystemMessage(self.memo_instruction.format(
@@ -249,7 +253,7 @@ class CareerAgent:
             pass
         
         
-        model = get_llm(mode=mode)
+        model = get_llm(mode=mode, node="main_agent")
         model = model.bind_tools(self.tools) # cause non streaming
 
 
@@ -278,7 +282,7 @@ class CareerAgent:
     def setup_memory_and_store(self):
         conn = connect(self.pg_uri, autocommit=True)
         self.store = PostgresStore(conn, index={
-            "embed": OllamaEmbeddings(model='nomic-embed-text'),
+            "embed": get_embeddings(),
             "dims": 768,
         })
         self.store.setup()
@@ -286,6 +290,21 @@ class CareerAgent:
         self.checkpointer = PostgresSaver(conn)
         self.checkpointer.setup()
 
+    async def asetup_memory_and_store(self, max_connections: int = 10):
+        """Async checkpointer and store, needed to run the graph with ainvoke/astream. Call from the serving event loop."""
+        # a pool, so concurrent sessions do not queue on one connection
+        pool = AsyncConnectionPool(self.pg_uri, max_size=max_connections, open=False,
+                                   kwargs={"autocommit": True, "prepare_threshold": 0})
+        await pool.open()
+        self.store = AsyncPostgresStore(pool, index={
+            "embed": get_embeddings(),
+            "dims": 768,
+        })
+        await self.store.setup()
+
+        self.checkpointer = AsyncPostgresSaver(pool)
+        await self.checkpointer.setup()
+
     
 
     def build(self):
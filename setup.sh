@@ -16,4 +16,7 @@ bash setup_2_service.sh
 echo "==> Running embedding Python script..."
 python3 setup_3_embed.py
 
+echo "==> Building HNSW index..."
+python3 setup_4_index.py create
+
 echo "==> All steps completed successfully."
\ No newline at end of file
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from psycopg.errors import UndefinedTable
+from agent import vector_index
+
+
+# Manage the ANN (HNSW) index of the PGVector collection.
+#   python setup_4_index.py create [--m 16 --ef-construction 64 --rebuild]
+#   python setup_4_index.py status
+#   python setup_4_index.py explain [--ef-search 100] [--workingtime fulltime] [--position "Postdoc Position"]
+parser = argparse.ArgumentParser(description="HNSW index management for the job collection.")
+sub = parser.add_subparsers(dest="command", required=True)
+
+create = sub.add_parser("create", help="Create (or rebuild) the cosine HNSW index, the filter indexes and the full-text index.")
+create.add_argument("--m", type=int, default=vector_index.hnsw_m)
+create.add_argument("--ef-construction", type=int, default=vector_index.hnsw_ef_construction)
+create.add_argument("--maintenance-work-mem", default="1GB")
+create.add_argument("--rebuild", action="store_true", help="Drop and rebuild to apply new parameters.")
+
+sub.add_parser("status", help="List ANN indexes on the embedding table.")
+
+explain = sub.add_parser("explain", help="Show which index a representative search uses.")
+explain.add_argument("--collection", default=vector_index.collection_name)
+explain.add_argument("--k", type=int, default=4)
+explain.add_argument("--ef-search", type=int, default=vector_index.hnsw_ef_search)
+for key in vector_index.FILTER_KEYS:
+    explain.add_argument(f"--{key}", help=f"Filter on metadata '{key}'.")
+
+args = parser.parse_args()
+
+if args.command == "create":
+    vector_index.create_hnsw_index(
+        m=args.m,
+        ef_construction=args.ef_construction,
+        rebuild=args.rebuild,
+        maintenance_work_mem=args.maintenance_work_mem,
+    )
+    vector_index.create_filter_indexes()
+    vector_index.create_fts_index()
+elif args.command == "status":
+    try:
+        with vector_index.get_connection() as conn:
+            print(json.dumps({
+                "ann": vector_index.list_vector_indexes(conn),
+                "filters": vector_index.list_filter_indexes(conn),
+            }, indent=2))
+    except UndefinedTable:
+        print("langchain_pg_embedding does not exist yet, run setup_3_embed.py first")
+elif args.command == "explain":
+    filters = {key: getattr(args, key) for key in vector_index.FILTER_KEYS if getattr(args, key)}
+    print(json.dumps(vector_index.explain_search(args.collection, k=args.k, ef_search=args.ef_search, filters=filters), indent=2))
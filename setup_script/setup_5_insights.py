@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent import vector_index
+from agent.jd_insight_store import get_insights, put_insights
+from agent.llm_provider import node_profile
+from agent.tools.analyze_market_tools import JobCriteriaComparison, JOB_CRITERIA_VERSION, extract_jd_criteria
+from agent.tools.match_cv_jd_tools import ExtractorOutput, EXTRACTOR_VERSION, run_extractor
+from agent.sub_agents import jd_agent, cv_agent
+
+
+# Precompute per-JD structured insights so interactive market analysis and CV
+# matching read them from the insight store instead of extracting per request.
+#   python setup_5_insights.py [--schema all] [--rate 20] [--window 22:00-06:00] [--resume]
+# schema, version, extraction function, node whose model profile does the extraction
+EXTRACTORS = {
+    # job_market_analysis / match_cv_jd tools
+    "criteria": (JobCriteriaComparison, JOB_CRITERIA_VERSION, extract_jd_criteria, "jd_parser"),
+    "extractor": (ExtractorOutput, EXTRACTOR_VERSION, run_extractor, "jd_extractor"),
+    # chat workflow: jd_agent synthesize and cv_agent content review
+    "synthesize": (jd_agent.JobCriteriaComparison, jd_agent.SYNTHESIZE_CRITERIA_VERSION, jd_agent.extract_synthesize_criteria, "jd_parser"),
+    "cv_extractor": (ExtractorOutput, cv_agent.JD_EXTRACTOR_VERSION, cv_agent.extract_jd_insights, "jd_extractor"),
+}
+
+parser = argparse.ArgumentParser(description="Precompute JD insights for the whole collection.")
+parser.add_argument("--collection", default=vector_index.collection_name)
+parser.add_argument("--schema", choices=[*EXTRACTORS, "all"], default="all", help="Which extraction(s) to precompute.")
+parser.add_argument("--page-size", type=int, default=50, help="JDs read from Postgres at a time.")
+parser.add_argument("--workers", type=int, default=1, help="Extraction calls in flight against the LLM.")
+parser.add_argument("--rate", type=float, default=20, help="Max extraction calls per minute.")
+parser.add_argument("--window", help="Only run between these local times, e.g. 22:00-06:00; waits outside it.")
+parser.add_argument("--limit", type=int, help="Stop after this many JDs (for trial runs).")
+parser.add_argument("--checkpoint", default="insights_checkpoint.json", help="Last JD id processed, written after every page.")
+parser.add_argument("--resume", action="store_true", help="Continue after the JD recorded in --checkpoint.")
+args = parser.parse_args()
+
+extractors = list(EXTRACTORS.values()) if args.schema == "all" else [EXTRACTORS[args.schema]]
+
+
+# 1. Checkpoint (keyset position in the collection)
+def load_checkpoint():
+    if not (args.resume and os.path.exists(args.checkpoint)):
+        return ""
+    with open(args.checkpoint) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("collection") != args.collection or checkpoint.get("schema") != args.schema:
+        print("checkpoint belongs to another run, starting from scratch")
+        return ""
+    return checkpoint["last_id"]
+
+def save_checkpoint(last_id):
+    tmp = args.checkpoint + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_id": last_id, "collection": args.collection, "schema": args.schema}, f)
+    os.replace(tmp, args.checkpoint)
+
+
+# 2. Off-peak window and rate limit
+def parse_window(window):
+    start, end = (datetime.strptime(t, "%H:%M").time() for t in window.split("-"))
+    return start, end
+
+def wait_for_window():
+    if not args.window:
+        return
+    start, end = parse_window(args.window)
+    while True:
+        now = datetime.now()
+        t = now.time()
+        inside = start <= t < end if start <= end else (t >= start or t < end)
+        if inside:
+            return
+        opens = datetime.combine(now.date(), start)
+        if opens <= now:
+            opens += timedelta(days=1)
+        print(f"outside off-peak window {args.window}, sleeping until {opens:%Y-%m-%d %H:%M}")
+        time.sleep(min(600, (opens - now).total_seconds()))
+
+class RateLimiter:
+    """Spaces calls at least 60/rate seconds apart across all workers."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+limiter = RateLimiter(args.rate)
+
+
+# 3. Walk the collection
+def read_page(conn, after_id):
+    return conn.execute("""
+        SELECT e.id, e.document
+        FROM langchain_pg_embedding e
+        JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+        WHERE c.name = %s AND e.id > %s
+        ORDER BY e.id
+        LIMIT %s
+    """, (args.collection, after_id, args.page_size)).fetchall()
+
+def extract_one(job):
+    jd_id, jd, (schema, version, extract, node) = job
+    wait_for_window()
+    limiter.wait()
+    try:
+        put_insights([(jd_id, jd, extract(jd))], version, node_profile(node)["model"], raise_errors=True)
+        return True
+    except Exception as e:
+        # left for the next run; rows already in the store are skipped
+        print(f"{schema.__name__} for JD {jd_id} failed: {e}")
+        return False
+
+last_id = load_checkpoint()
+if last_id:
+    print(f"resuming after JD {last_id}")
+
+done = failed = seen = 0
+progress = tqdm(desc="JDs", unit="jd")
+with vector_index.get_connection() as conn, ThreadPoolExecutor(max_workers=args.workers) as executor:
+    while True:
+        rows = read_page(conn, last_id)
+        if args.limit:
+            rows = rows[:max(0, args.limit - seen)]
+        if not rows:
+            break
+
+        page = {str(jd_id): jd for jd_id, jd in rows}
+        jobs = []
+        for extractor in extractors:
+            stored = get_insights(page, extractor[0], extractor[1], node_profile(extractor[3])["model"])
+            jobs += [(jd_id, jd, extractor) for jd_id, jd in page.items() if jd_id not in stored]
+
+        for ok in executor.map(extract_one, jobs):
+            done += ok
+            failed += not ok
+
+        last_id = rows[-1][0]
+        seen += len(rows)
+        save_checkpoint(last_id)
+        progress.update(len(rows))
+
+progress.close()
+print(f"done: {seen} JDs checked, {done} extractions stored, {failed} failed")
+if failed:
+    print("run again without --resume to retry the failed JDs (stored insights are skipped)")
+if failed == 0 and not args.limit and os.path.exists(args.checkpoint):
+    os.remove(args.checkpoint)
@@ -79,7 +79,7 @@ def demo_score_jds_tool(available_job):
     return gr.MultimodalTextbox(value=f"Chấm điểm độ phù hợp cv của tôi với công việc {available_job_index}.")
 
 def demo_match_cv_jd_tool(available_job):
-    available_job_index = [job['id'] for job in available_job][0] or 7363
+    available_job_index = [job['id'] for job in available_job][0]
     return gr.MultimodalTextbox(value=f"Hãy review, chỉnh sửa cv của tôi với job {available_job_index}")
     
 def demo_analyze_market_tool():